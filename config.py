@@ -8,6 +8,17 @@ class Settings:
     EMAIL_FROM = os.getenv("EMAIL_FROM")
     BREVO_API_KEY: str = os.getenv("BREVO_API_KEY")
     FROM_NAME = os.getenv("FROM_NAME", "AI eBOOK Support")
+    REDIS_URL = os.getenv("REDIS_URL")
+    # Entries kept by the in-process cache used when REDIS_URL is unset
+    LOCAL_CACHE_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", 1024))
+    # Worker processes serving the app (uvicorn and gunicorn read the same variable)
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+    COGNITO_USER_POOL_ID = os.getenv("COGNITO_USER_POOL_ID", "ap-southeast-2_88E6gZpZz")
+    # Seconds between Cognito -> users table syncs; 0 disables the job
+    COGNITO_SYNC_INTERVAL = int(os.getenv("COGNITO_SYNC_INTERVAL", 300))
+    # Seconds between materialized view refreshes; 0 disables the job
+    VIEW_REFRESH_INTERVAL = int(os.getenv("VIEW_REFRESH_INTERVAL", 3600))
+    LEADERBOARD_REFRESH_INTERVAL = int(os.getenv("LEADERBOARD_REFRESH_INTERVAL", 300))
 
 
 settings = Settings()
@@ -28,14 +28,23 @@ def serialize_admin(admin):
         "school": admin.school,
     }
 
-def get_all_admins(page: int = 1, page_limit: int = 20):
+def serialize_admin_summary(row):
+    return {
+        "id": str(row.id),
+        "email": row.email,
+        "name": row.name,
+        "school": {"name": row.school_name} if row.school_name is not None else None,
+    }
+
+def get_all_admins(page: int = 1, page_limit: int = 20, detail: bool = False):
     db: Session = next(get_db())
-    admins = db_get_all_admins(db)
+    admins = db_get_all_admins(db, detail=detail)
+    serialize = serialize_admin if detail else serialize_admin_summary
     total_count = len(admins)
     return {
         "success": True,
         "data": {
-            "admins": [serialize_admin(a) for a in admins],
+            "admins": [serialize(a) for a in admins],
             "total_count": total_count,
             "page": page,
             "page_limit": page_limit
@@ -1,10 +1,11 @@
 from services.analytics_service import (
     get_daily_reading_duration_analytics as db_get_daily_reading_duration_analytics,
     get_user_daily_reading_duration as db_get_user_daily_reading_duration,
-    get_school_daily_reading_duration as db_get_school_daily_reading_duration
+    get_school_daily_reading_duration as db_get_school_daily_reading_duration,
+    get_schools_daily_reading_duration as db_get_schools_daily_reading_duration
 )
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import List, Optional
 
 
 def get_daily_reading_duration_analytics(db: Session, days: int = 130):
@@ -82,3 +83,27 @@ def get_school_daily_reading_duration(school_id: str, db: Session, days: int = 3
         "message": f"School daily reading duration analytics fetched successfully for the last {days} days",
         "error": None
     }
+
+
+def get_schools_daily_reading_duration(db: Session, days: int = 30, school_ids: Optional[List[str]] = None):
+    """Get daily reading duration analytics for many schools in one pass"""
+    result = db_get_schools_daily_reading_duration(db, days, school_ids)
+    
+    if result is None:
+        return {
+            "success": False,
+            "data": None,
+            "message": "Failed to fetch daily reading duration analytics for schools",
+            "error": "DATABASE_ERROR"
+        }
+    
+    return {
+        "success": True,
+        "data": {
+            "schools": result,
+            "total_schools": len(result),
+            "period": f"Last {days} days"
+        },
+        "message": f"Schools daily reading duration analytics fetched successfully for the last {days} days",
+        "error": None
+    }
@@ -1,5 +1,6 @@
 from services.books_service import (
     get_all_books as db_get_all_books,
+    decode_book_cursor,
     get_book_by_id as db_get_book_by_id,
     add_book as db_add_book,
     update_book as db_update_book,
@@ -37,9 +38,9 @@ def serialize_book(book):
     }
 
 
-def get_all_books(db: Session, page: int = 1, limit: int = 20, status: str = None):
+def get_all_books(db: Session, page: int = 1, limit: int = 20, status: str = None, after: tuple = None):
     """Get all books with pagination and optional status filtering"""
-    result = db_get_all_books(db, page, limit, status)
+    result = db_get_all_books(db, page, limit, status, after)
     
     if result is None:
         return {
@@ -55,7 +56,8 @@ def get_all_books(db: Session, page: int = 1, limit: int = 20, status: str = Non
             "books": [serialize_book(book) for book in result["books"]],
             "total_count": result["total_count"],
             "page": result["page"],
-            "limit": result["limit"]
+            "limit": result["limit"],
+            "next_cursor": result["next_cursor"]
         },
         "message": "Books fetched successfully",
         "error": None
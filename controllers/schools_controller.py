@@ -6,15 +6,22 @@ from services.schools_service import (
     delete_school as db_delete_school,
     delete_bulk_schools as db_delete_bulk_schools,
     get_schools_analytics as db_get_schools_analytics,
+    iter_schools_analytics as db_iter_schools_analytics,
     get_schools_by_status as db_get_schools_by_status,
     get_school_analytics_by_id as db_get_school_analytics_by_id
 )
 from services.leaderboard import get_school_leaderboard
+from services.admins_service import is_valid_uuid
 from sqlalchemy.orm import Session
+from database.connection import SessionLocal
 from database.models import School
 import json
+import logging
+import orjson
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
 
 def serialize_school(school):
     """Serialize school object to dictionary"""
@@ -214,6 +221,26 @@ def get_schools_analytics(db: Session, page: int = 1, perPage: int = 20, name: O
     }
 
 
+def stream_schools_analytics(name: Optional[str] = None, state: Optional[str] = None, city: Optional[str] = None, sort: Optional[str] = None):
+    """Yield the analytics of every matching school as newline-delimited JSON"""
+    # The request-scoped session is closed before the body streams, so use our own
+    db = SessionLocal()
+    try:
+        for school_data in db_iter_schools_analytics(db, name, state, city, sort):
+            yield orjson.dumps(school_data) + b"\n"
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error streaming schools analytics: {e}")
+        # The 200 status is already sent; a final error line tells the client the export is incomplete
+        yield orjson.dumps({
+            "success": False,
+            "message": "Export stopped before every school was written",
+            "error": "ANALYTICS_ERROR"
+        }) + b"\n"
+    finally:
+        db.close()
+
+
 def get_schools_by_status(status: str, db: Session, page: int = 1, limit: int = 20):
     """Get schools filtered by status"""
     result = db_get_schools_by_status(status, db, page, limit)
@@ -263,10 +290,7 @@ def get_school_analytics_by_id(school_id: str, db: Session):
 def get_school_leaderboard_controller(school_id: str, db: Session, page: int = 1, limit: int = 20):
     """Get leaderboard for a specific school"""
     # Validate UUID format first
-    import uuid
-    try:
-        uuid.UUID(school_id)
-    except ValueError:
+    if not is_valid_uuid(school_id):
         return {
             "success": False,
             "data": None,
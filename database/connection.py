@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -6,11 +8,19 @@ from sqlalchemy.pool import QueuePool
 
 SQLALCHEMY_DATABASE_URL = os.getenv("POSTGRES_URL")
 
+# Pool sizing is per worker process. The sync and async engines split a budget
+# of 20 + 10 connections by default; keep workers * the sum of both engines'
+# pool_size + max_overflow below the server's max_connections
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 5))
+ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", 10))
+ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", 5))
+
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     poolclass=QueuePool,
-    pool_size=5,
-    max_overflow=10,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
     pool_timeout=30,
     pool_recycle=1800,  # Recycle connections after 30 minutes
     pool_pre_ping=True  # Enable connection health checks
@@ -18,6 +28,29 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _async_database_url(url):
+    """Point POSTGRES_URL at the asyncpg driver, which spells sslmode as ssl"""
+    url = make_url(url).set(drivername="postgresql+asyncpg")
+    sslmode = url.query.get("sslmode")
+    if sslmode:
+        url = url.difference_update_query(["sslmode"]).update_query_dict({"ssl": sslmode})
+    return url
+
+
+# Async engine for routes that await the database instead of blocking the event loop
+async_engine = create_async_engine(
+    _async_database_url(SQLALCHEMY_DATABASE_URL),
+    pool_size=ASYNC_POOL_SIZE,
+    max_overflow=ASYNC_MAX_OVERFLOW,
+    pool_timeout=30,
+    pool_recycle=1800,
+    pool_pre_ping=True
+)
+
+# expire_on_commit=False so committed objects can still be serialized without a lazy load
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -31,3 +64,13 @@ def get_db():
         raise
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception as e:
+            print(f"Database error: {str(e)}")
+            await db.rollback()
+            raise
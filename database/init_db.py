@@ -1,5 +1,7 @@
 from database.connection import engine
 from database.models import Base
+from database.views import create_views
+from sqlalchemy import text
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -18,6 +20,86 @@ def init_db():
         logger.error(f"Error creating database tables: {str(e)}")
         raise
 
+def create_indexes():
+    """
+    Create indexes declared on the models that are missing from existing tables.
+    create_all() only builds indexes together with a new table, so run this after
+    adding an index to a model that already has a table in the database.
+    """
+    try:
+        logger.info("Creating missing indexes...")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(bind=conn, checkfirst=True)
+        logger.info("Indexes created successfully!")
+    except Exception as e:
+        logger.error(f"Error creating indexes: {str(e)}")
+        raise
+
+def migrate_reading_history_score():
+    """
+    Convert reading_history.score from text to double precision.
+    Values that aren't numbers (empty strings, 'None') become NULL. The leaderboard
+    views read the column, so they are dropped here and rebuilt by init_views().
+    The table is rewritten under an exclusive lock, so run it off-peak.
+    """
+    try:
+        with engine.begin() as conn:
+            data_type = conn.execute(text(
+                "SELECT data_type FROM information_schema.columns "
+                "WHERE table_name = 'reading_history' AND column_name = 'score'"
+            )).scalar()
+            if data_type is None or data_type == "double precision":
+                return
+            logger.info("Converting reading_history.score to double precision...")
+            conn.execute(text("DROP MATERIALIZED VIEW IF EXISTS leaderboard_schools"))
+            conn.execute(text("DROP MATERIALIZED VIEW IF EXISTS leaderboard_users"))
+            conn.execute(text(
+                "ALTER TABLE reading_history ALTER COLUMN score TYPE double precision "
+                r"USING CASE WHEN score ~ '^\s*[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]+)?\s*$' "
+                "THEN score::double precision END"
+            ))
+        logger.info("reading_history.score converted successfully!")
+    except Exception as e:
+        logger.error(f"Error converting reading_history.score: {str(e)}")
+        raise
+
+def migrate_reading_history_daily_school():
+    """
+    Drop reading_history_daily if it was built before it carried school_id.
+    CREATE MATERIALIZED VIEW IF NOT EXISTS won't change an existing view, so it is
+    rebuilt with the new definition by init_views().
+    """
+    try:
+        with engine.begin() as conn:
+            outdated = conn.execute(text(
+                "SELECT to_regclass('reading_history_daily') IS NOT NULL AND NOT EXISTS ("
+                "SELECT 1 FROM pg_attribute "
+                "WHERE attrelid = to_regclass('reading_history_daily') AND attname = 'school_id')"
+            )).scalar()
+            if not outdated:
+                return
+            logger.info("Dropping reading_history_daily to rebuild it with school_id...")
+            conn.execute(text("DROP MATERIALIZED VIEW reading_history_daily"))
+    except Exception as e:
+        logger.error(f"Error migrating reading_history_daily: {str(e)}")
+        raise
+
+def init_views():
+    """
+    Create the materialized views (see database/views.py) if they don't exist yet.
+    """
+    try:
+        logger.info("Creating materialized views...")
+        with engine.begin() as conn:
+            create_views(conn)
+        logger.info("Materialized views created successfully!")
+    except Exception as e:
+        logger.error(f"Error creating materialized views: {str(e)}")
+        raise
+
 def drop_all_tables():
     """
     Drop all tables from the database.
@@ -33,4 +115,8 @@ def drop_all_tables():
 
 if __name__ == "__main__":
     # When running this file directly, initialize the database
-    init_db() 
\ No newline at end of file
+    init_db()
+    create_indexes()
+    migrate_reading_history_score()
+    migrate_reading_history_daily_school()
+    init_views()
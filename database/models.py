@@ -3,7 +3,7 @@ from datetime import datetime
 from decimal import Decimal
 import json
 
-from sqlalchemy import Column, String, ARRAY, DateTime, ForeignKey, JSON, Integer, Float
+from sqlalchemy import Column, String, ARRAY, DateTime, ForeignKey, JSON, Integer, Float, Index, DDL, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.types import TypeDecorator, JSON as SQLAlchemyJSON
@@ -18,6 +18,7 @@ class DecimalEncoder(json.JSONEncoder):
 
 class JSONEncodedDict(TypeDecorator):
     impl = SQLAlchemyJSON
+    cache_ok = True
 
     def process_bind_param(self, value, dialect):
         if value is not None:
@@ -41,6 +42,13 @@ class School(Base):
     # Relationships
     admins = relationship("Admin", back_populates="school")
 
+    __table_args__ = (
+        # Index-assisted '%keyword%' ILIKE on the school list and analytics filters
+        Index("ix_schools_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_schools_state_trgm", "state", postgresql_using="gin", postgresql_ops={"state": "gin_trgm_ops"}),
+        Index("ix_schools_city_trgm", "city", postgresql_using="gin", postgresql_ops={"city": "gin_trgm_ops"}),
+    )
+
 class User(Base):
     __tablename__ = "users"
 
@@ -54,7 +62,7 @@ class User(Base):
     birth = Column(String)
     address = Column(String)
     parent = Column(String)
-    school_id = Column(UUID(as_uuid=True), ForeignKey("schools.id"), nullable=True)
+    school_id = Column(UUID(as_uuid=True), ForeignKey("schools.id"), nullable=True, index=True)
     registration_status = Column(String, default='pending')
     rewards = Column(ARRAY(String))
     created_at = Column(DateTime, default=datetime.now)
@@ -76,10 +84,15 @@ class Books(Base):
     genres = Column(ARRAY(String))
     author = Column(String)
     pages = Column(Integer)
-    status = Column(String)
+    status = Column(String, index=True)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now)
 
+    __table_args__ = (
+        # Newest-first keyset pagination of the book list
+        Index("ix_books_created_id", created_at.desc().nulls_last(), id.desc()),
+    )
+
 class HighLights(Base):
     __tablename__ = "highlights"
 
@@ -100,6 +113,19 @@ class HighLights(Base):
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now)
 
+    __table_args__ = (
+        # Per-user listing ordered by newest first
+        Index("ix_highlights_user_created", user_id, created_at.desc()),
+        # The "with notes" listing, which is the default for readers
+        Index(
+            "ix_highlights_user_with_notes", user_id, created_at.desc(),
+            postgresql_where=notes.isnot(None) & (notes != "")
+        ),
+        # Trigram indexes make the '%keyword%' ILIKE search index-assisted
+        Index("ix_highlights_text_trgm", "text", postgresql_using="gin", postgresql_ops={"text": "gin_trgm_ops"}),
+        Index("ix_highlights_notes_trgm", "notes", postgresql_using="gin", postgresql_ops={"notes": "gin_trgm_ops"}),
+    )
+
 class Quiz(Base):
     __tablename__ = "quiz"
 
@@ -131,6 +157,17 @@ class Rewards(Base):
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now)
 
+    __table_args__ = (
+        # Newest-first paging of the reward list
+        Index("ix_rewards_created", created_at.desc()),
+        # Index-assisted '%keyword%' ILIKE on the title
+        Index("ix_rewards_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+    )
+
+# gin_trgm_ops comes from the pg_trgm extension
+for _trgm_table in (School.__table__, HighLights.__table__, Rewards.__table__):
+    event.listen(_trgm_table, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
 
 class ReadingHistory(Base):
     __tablename__ = "reading_history"
@@ -140,11 +177,24 @@ class ReadingHistory(Base):
     book_id = Column(UUID(as_uuid=True), ForeignKey("books.id"))
     duration = Column(Integer)
     percentage = Column(String)
-    score = Column(String)
+    score = Column(Float)
     started_at = Column(DateTime)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now)
 
+    __table_args__ = (
+        # Per-user history, newest first (reading progress and "last read" checks);
+        # INCLUDE lets the per-user history page be answered by an index-only scan
+        Index(
+            "ix_reading_history_user_started",
+            user_id,
+            started_at.desc(),
+            postgresql_include=["duration", "score", "book_id", "percentage"]
+        ),
+        # Date-range filters across all users (active students this month, view refresh)
+        Index("ix_reading_history_started", started_at),
+    )
+
 class ReadingStatistics(Base):
     __tablename__ = "reading_statistics"
 
@@ -0,0 +1,169 @@
+from sqlalchemy import MetaData, Table, Column, Date, BigInteger, Float, String, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Session
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Materialized views live outside Base.metadata so create_all() never builds them as tables
+view_metadata = MetaData()
+
+# One row per (day, user) rolled up from reading_history, carrying the user's
+# school so school analytics filter the rollup without joining users
+reading_history_daily = Table(
+    "reading_history_daily",
+    view_metadata,
+    Column("day", Date),
+    Column("user_id", UUID(as_uuid=True)),
+    Column("school_id", UUID(as_uuid=True)),
+    Column("total_duration", BigInteger),
+    Column("sessions", BigInteger),
+)
+
+# One row per (month, user) for users with 3+ reading sessions over 20 seconds that
+# month: the "active students" of the school analytics
+monthly_active_students = Table(
+    "monthly_active_students",
+    view_metadata,
+    Column("month", Date),
+    Column("user_id", UUID(as_uuid=True)),
+)
+
+# One row per user with reading statistics or quiz scores, for the student leaderboards
+leaderboard_users = Table(
+    "leaderboard_users",
+    view_metadata,
+    Column("user_id", UUID(as_uuid=True)),
+    Column("ic_number", String),
+    Column("name", String),
+    Column("avatar_url", String),
+    Column("school_name", String),
+    Column("total_read_books", BigInteger),
+    Column("total_read_period", BigInteger),
+    Column("longest_continuous_read_period", BigInteger),
+    Column("total_quiz_score", Float),
+)
+
+# leaderboard_users rolled up per school name, for the school leaderboards
+leaderboard_schools = Table(
+    "leaderboard_schools",
+    view_metadata,
+    Column("school_name", String),
+    Column("total_read_books", BigInteger),
+    Column("total_read_period", BigInteger),
+    Column("total_quiz_score", Float),
+)
+
+# name -> DDL creating the view, the unique index REFRESH ... CONCURRENTLY needs,
+# then any secondary indexes
+MATERIALIZED_VIEWS = {
+    "reading_history_daily": (
+        """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS reading_history_daily AS
+        SELECT date(rh.started_at) AS day,
+               rh.user_id,
+               u.school_id,
+               SUM(rh.duration) AS total_duration,
+               COUNT(rh.id) AS sessions
+        FROM reading_history rh
+        LEFT JOIN users u ON u.id = rh.user_id
+        GROUP BY 1, 2, 3
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_reading_history_daily ON reading_history_daily (day, user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_reading_history_daily_school ON reading_history_daily (school_id, day)",
+    ),
+    "monthly_active_students": (
+        """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS monthly_active_students AS
+        SELECT CAST(date_trunc('month', started_at) AS date) AS month,
+               user_id
+        FROM reading_history
+        WHERE duration > 20 AND user_id IS NOT NULL
+        GROUP BY 1, 2
+        HAVING COUNT(id) >= 3
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_monthly_active_students ON monthly_active_students (month, user_id)",
+    ),
+    "leaderboard_users": (
+        """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS leaderboard_users AS
+        SELECT u.id AS user_id,
+               u.ic_number,
+               u.name,
+               u.avatar_url,
+               s.name AS school_name,
+               rs.total_read_books,
+               rs.total_read_period,
+               rs.longest_continuous_read_period,
+               qs.total_quiz_score
+        FROM users u
+        LEFT JOIN schools s ON s.id = u.school_id
+        LEFT JOIN (
+            SELECT user_id,
+                   SUM(total_read_books) AS total_read_books,
+                   SUM(total_read_period) AS total_read_period,
+                   MAX(longest_continuous_read_period) AS longest_continuous_read_period
+            FROM reading_statistics
+            GROUP BY user_id
+        ) rs ON rs.user_id = u.id
+        LEFT JOIN (
+            SELECT user_id, SUM(score) AS total_quiz_score
+            FROM reading_history
+            GROUP BY user_id
+        ) qs ON qs.user_id = u.id
+        WHERE rs.user_id IS NOT NULL OR qs.user_id IS NOT NULL
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_leaderboard_users ON leaderboard_users (user_id)",
+        # Top-N by each metric reads the first rows of an index instead of sorting the view
+        "CREATE INDEX IF NOT EXISTS ix_leaderboard_users_read_books ON leaderboard_users (total_read_books DESC)",
+        "CREATE INDEX IF NOT EXISTS ix_leaderboard_users_read_period ON leaderboard_users (total_read_period DESC)",
+        "CREATE INDEX IF NOT EXISTS ix_leaderboard_users_quiz_score ON leaderboard_users (total_quiz_score DESC)",
+    ),
+    # Built from leaderboard_users, so it must stay after it (creation and refresh order)
+    "leaderboard_schools": (
+        """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS leaderboard_schools AS
+        SELECT school_name,
+               CAST(SUM(total_read_books) AS bigint) AS total_read_books,
+               CAST(SUM(total_read_period) AS bigint) AS total_read_period,
+               SUM(total_quiz_score) AS total_quiz_score
+        FROM leaderboard_users
+        WHERE school_name IS NOT NULL
+        GROUP BY school_name
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_leaderboard_schools ON leaderboard_schools (school_name)",
+    ),
+}
+
+# Refreshed on separate schedules: analytics can lag more than the leaderboards
+ANALYTICS_VIEWS = ("reading_history_daily", "monthly_active_students")
+LEADERBOARD_VIEWS = ("leaderboard_users", "leaderboard_schools")
+
+
+def create_views(conn, names=None):
+    """Create any of the named materialized views (default: all) that don't exist yet"""
+    for name in names or MATERIALIZED_VIEWS:
+        for statement in MATERIALIZED_VIEWS[name]:
+            conn.execute(text(statement))
+
+
+def refresh_materialized_views(db: Session, names=None):
+    """Create missing views, then refresh them without blocking readers"""
+    names = names or tuple(MATERIALIZED_VIEWS)
+    try:
+        create_views(db, names)
+        for name in names:
+            db.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}"))
+        db.commit()
+        logger.info(f"Refreshed materialized views: {', '.join(names)}")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error refreshing materialized views: {e}")
+
+
+def refresh_analytics_views(db: Session):
+    refresh_materialized_views(db, ANALYTICS_VIEWS)
+
+
+def refresh_leaderboard_views(db: Session):
+    refresh_materialized_views(db, LEADERBOARD_VIEWS)
@@ -1,8 +1,11 @@
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 from dotenv import load_dotenv
 
@@ -24,9 +27,32 @@ from routers import books_route
 from routers import schools_route
 from routers import users_route
 from routers import analytics_route
+from config import settings
+from services.scheduler import run_periodically
+from services.users_service import sync_cognito_users
+from database.views import refresh_analytics_views, refresh_leaderboard_views
+from services.brevo_service import close_async_client as close_email_client
+from services.cache import close_async_cache
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background jobs kept off the request path
+    tasks = []
+    if settings.COGNITO_SYNC_INTERVAL > 0:
+        tasks.append(asyncio.create_task(run_periodically(sync_cognito_users, settings.COGNITO_SYNC_INTERVAL)))
+    if settings.VIEW_REFRESH_INTERVAL > 0:
+        tasks.append(asyncio.create_task(run_periodically(refresh_analytics_views, settings.VIEW_REFRESH_INTERVAL)))
+    if settings.LEADERBOARD_REFRESH_INTERVAL > 0:
+        tasks.append(asyncio.create_task(run_periodically(refresh_leaderboard_views, settings.LEADERBOARD_REFRESH_INTERVAL)))
+    yield
+    for task in tasks:
+        task.cancel()
+    await close_email_client()
+    await close_async_cache()
+
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # TODO: add specific origins here
 origins = ['*']
@@ -39,6 +65,10 @@ app.add_middleware(
   allow_headers=['*'],
 )
 
+# Compress larger JSON bodies (list endpoints); responses that set their own
+# Content-Encoding, like the event streams, are passed through untouched
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Add routers to app
 app.include_router(langchain.router)
 app.include_router(audio.router)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Path, Body
+from fastapi import APIRouter, Path, Body, Query
 from controllers.admins_controller import (
     get_all_admins,
     get_admin_by_id,
@@ -13,8 +13,8 @@ from controllers.admins_controller import (
 router = APIRouter(prefix="/api/admins", tags=["admins"])
 
 @router.get("", summary="Get all admins")
-def route_get_all_admins():
-    return get_all_admins()
+def route_get_all_admins(detail: bool = Query(False, description="Return full admin and school records")):
+    return get_all_admins(detail=detail)
 
 @router.get("/by_id/{admin_id}", summary="Get one admin by ID")
 def route_get_admin_by_id(admin_id: str = Path(...)):
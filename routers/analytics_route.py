@@ -1,15 +1,20 @@
 from fastapi import APIRouter, Path, Query, Depends
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import List, Optional
 from dependencies import get_db_session
 from controllers.analytics_controller import (
     get_daily_reading_duration_analytics,
     get_user_daily_reading_duration,
-    get_school_daily_reading_duration
+    get_school_daily_reading_duration,
+    get_schools_daily_reading_duration
 )
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 
+# The payloads are already JSON-native (dates are formatted in SQL), so they are
+# handed straight to orjson instead of being walked by jsonable_encoder first
+
 
 @router.get("/reading-duration/daily", summary="Get daily reading duration analytics")
 def route_get_daily_reading_duration_analytics(
@@ -17,7 +22,7 @@ def route_get_daily_reading_duration_analytics(
     db: Session = Depends(get_db_session)
 ):
     """Get daily reading duration analytics for the last N days across all users"""
-    return get_daily_reading_duration_analytics(db, days)
+    return ORJSONResponse(get_daily_reading_duration_analytics(db, days))
 
 
 @router.get("/reading-duration/daily/user/{user_id}", summary="Get user daily reading duration analytics")
@@ -27,7 +32,7 @@ def route_get_user_daily_reading_duration(
     db: Session = Depends(get_db_session)
 ):
     """Get daily reading duration analytics for a specific user for the last N days"""
-    return get_user_daily_reading_duration(user_id, db, days)
+    return ORJSONResponse(get_user_daily_reading_duration(user_id, db, days))
 
 
 @router.get("/reading-duration/daily/school/{school_id}", summary="Get school daily reading duration analytics")
@@ -37,4 +42,14 @@ def route_get_school_daily_reading_duration(
     db: Session = Depends(get_db_session)
 ):
     """Get daily reading duration analytics for a specific school for the last N days"""
-    return get_school_daily_reading_duration(school_id, db, days)
+    return ORJSONResponse(get_school_daily_reading_duration(school_id, db, days))
+
+
+@router.get("/reading-duration/daily/schools", summary="Get daily reading duration analytics for many schools")
+def route_get_schools_daily_reading_duration(
+    days: int = Query(30, ge=1, le=365, description="Number of days to analyze (1-365)"),
+    school_ids: Optional[List[str]] = Query(None, description="School IDs to include (default: all schools)"),
+    db: Session = Depends(get_db_session)
+):
+    """Get daily reading duration analytics for many schools with a single query"""
+    return ORJSONResponse(get_schools_daily_reading_duration(db, days, school_ids))
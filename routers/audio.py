@@ -5,7 +5,7 @@ import os
 from elevenlabs import ElevenLabs
 import json
 from datetime import datetime
-from services.aws_resources import S3_CLIENT
+from services.aws_resources import get_s3_client
 
 client = OpenAI()
 import os
@@ -80,7 +80,7 @@ async def route(file: UploadFile = File(...), messages: str = Form(...), res: Re
             try:
                 with open(speech_file_path, 'rb') as file_to_upload:
                     upload_params['Body'] = file_to_upload
-                    S3_CLIENT.put_object(**upload_params)
+                    get_s3_client().put_object(**upload_params)
                 # Delete the file from local after successful upload
                 os.remove(speech_file_path)
             except Exception as e:
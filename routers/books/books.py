@@ -1,11 +1,12 @@
 from fastapi import APIRouter, File, UploadFile, Depends, Request, Response, BackgroundTasks
 from sqlalchemy.orm import Session
-from services.aws_resources import S3_CLIENT, S3_REGION, quizzes_table, rewards_table, highlights_table, reading_statistics_table, reading_history_table, ic_numbers_table, ebook_table, EBOOK_TAG_TABLE, ic_numbers_table, cognito
+from services.aws_resources import get_s3_client, get_cognito, get_table, S3_REGION
 from boto3.dynamodb.conditions import Attr
 from datetime import datetime
 import uuid
 from database.connection import get_db
 from database.models import Books, User, Rewards, FavoriteBooks, Quiz, HighLights, ReadingStatistics, ReadingHistory
+from services.books_service import invalidate_books_analytics
 from sqlalchemy import text
 
 # S3 Bucket
@@ -29,7 +30,7 @@ async def route(file: UploadFile = File(...), res: Response = Response()):
 
     # Upload to S3
     try:
-        S3_CLIENT.put_object(**upload_params)
+        get_s3_client().put_object(**upload_params)
         file_url = f"https://{BUCKET_NAME}.s3.{S3_REGION}.amazonaws.com/{file_key}"
 
         return {"file_url": file_url, "filename": file.filename, 'file_key': file_key}
@@ -155,6 +156,7 @@ async def delete_ebook(file_id: str, res: Response = Response(), db: Session = D
         
         # Commit the changes
         db.commit()
+        invalidate_books_analytics()
         
         return {"success": True, "message": f"Book '{file_id}' marked as deleted"}
     except Exception as e:
@@ -165,12 +167,12 @@ async def delete_ebook(file_id: str, res: Response = Response(), db: Session = D
 async def migrate_db():
     try:
         # Scan all books from DynamoDB
-        response = ic_numbers_table.scan()
+        response = get_table('IC_Numbers').scan()
         books = response.get('Items', [])
         
         # Handle pagination if necessary
         while 'LastEvaluatedKey' in response:
-            response = ebook_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
+            response = get_table('ebook-store').scan(ExclusiveStartKey=response['LastEvaluatedKey'])
             books.extend(response.get('Items', []))
         
         # Get database session
@@ -211,6 +213,7 @@ async def migrate_db():
         
         # Commit changes
         db.commit()
+        invalidate_books_analytics()
         
         return {
             'status': 'success',
@@ -227,12 +230,12 @@ async def migrate_db():
 async def migrate_users():
     try:
         # Scan all users from DynamoDB
-        response = ic_numbers_table.scan()
+        response = get_table('IC_Numbers').scan()
         users = response.get('Items', [])
         
         # Handle pagination if necessary
         while 'LastEvaluatedKey' in response:
-            response = ic_numbers_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
+            response = get_table('IC_Numbers').scan(ExclusiveStartKey=response['LastEvaluatedKey'])
             users.extend(response.get('Items', []))
         
         # Get database session
@@ -285,12 +288,12 @@ async def migrate_users():
 async def migrate_rewards():
     try:
         # Scan all rewards from DynamoDB
-        response = rewards_table.scan()
+        response = get_table('Rewards').scan()
         rewards = response.get('Items', [])
         
         # Handle pagination if necessary
         while 'LastEvaluatedKey' in response:
-            response = rewards_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
+            response = get_table('Rewards').scan(ExclusiveStartKey=response['LastEvaluatedKey'])
             rewards.extend(response.get('Items', []))
         
         # Get database session
@@ -334,12 +337,12 @@ async def migrate_rewards():
 async def migrate_quizzes():
     try:
         # Scan all quizzes from DynamoDB
-        response = quizzes_table.scan()
+        response = get_table('quizzes').scan()
         quizzes = response.get('Items', [])
         
         # Handle pagination if necessary
         while 'LastEvaluatedKey' in response:
-            response = quizzes_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
+            response = get_table('quizzes').scan(ExclusiveStartKey=response['LastEvaluatedKey'])
             quizzes.extend(response.get('Items', []))
         
         # Get database session
@@ -397,12 +400,12 @@ async def migrate_quizzes():
 async def migrate_reading_history():
     try:
         # Scan all reading history from DynamoDB
-        response = reading_history_table.scan()
+        response = get_table('reading_history').scan()
         history_items = response.get('Items', [])
         
         # Handle pagination if necessary
         while 'LastEvaluatedKey' in response:
-            response = reading_history_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
+            response = get_table('reading_history').scan(ExclusiveStartKey=response['LastEvaluatedKey'])
             history_items.extend(response.get('Items', []))
         
         # Get database session
@@ -432,7 +435,7 @@ async def migrate_reading_history():
                     book_id=book_id,
                     duration=int(item.get('duration', 0)),
                     percentage=item.get('percent', 0),
-                    score=item.get('score', 0),
+                    score=float(item.get('score') or 0),
                     started_at=datetime.fromisoformat(item.get('started_time').replace('Z', '+00:00')),
                 )
                 
@@ -462,12 +465,12 @@ async def migrate_reading_history():
 async def migrate_reading_statistics():
     try:
         # Scan all reading statistics from DynamoDB
-        response = reading_statistics_table.scan()
+        response = get_table('reading_statistics').scan()
         stats_items = response.get('Items', [])
         
         # Handle pagination if necessary
         while 'LastEvaluatedKey' in response:
-            response = reading_statistics_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
+            response = get_table('reading_statistics').scan(ExclusiveStartKey=response['LastEvaluatedKey'])
             stats_items.extend(response.get('Items', []))
         
         # Get database session
@@ -530,12 +533,12 @@ async def migrate_reading_statistics():
 async def migrate_highlights():
     try:
         # Scan all highlights from DynamoDB
-        response = highlights_table.scan()
+        response = get_table('highlights').scan()
         highlight_items = response.get('Items', [])
         
         # Handle pagination if necessary
         while 'LastEvaluatedKey' in response:
-            response = highlights_table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
+            response = get_table('highlights').scan(ExclusiveStartKey=response['LastEvaluatedKey'])
             highlight_items.extend(response.get('Items', []))
         
         # Get database session
@@ -616,7 +619,7 @@ async def update_user_table(db: Session = Depends(get_db)):
                 params['PaginationToken'] = pagination_token
                 
             # Get users for current page
-            response = cognito.list_users(**params)
+            response = get_cognito().list_users(**params)
             
             # Add users from current page to our list
             cognito_users.extend(response['Users'])
@@ -1,20 +1,22 @@
+import logging
 from fastapi import APIRouter, Request, Response, Depends
-from openai import OpenAI
 from boto3.dynamodb.conditions import Attr
-from services.aws_resources import highlights_table
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, update
+from datetime import datetime
 from database.connection import get_db
 from database.models import HighLights, User, Books
+from schemas.models import HighlightListResponse, HighlightOut, HighlightPatch
 
-client = OpenAI()
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/api/highlights",
     tags=["highlights"],
 )
 
-@router.get("/list")
+# exclude_unset keeps the envelope identical for the success and error paths
+@router.get("/list", response_model=HighlightListResponse, response_model_exclude_unset=True)
 async def getHighlights(
     request: Request, 
     res: Response = Response(),
@@ -29,9 +31,38 @@ async def getHighlights(
         user_ic = request.query_params.get('user_id', '')
         isNote = request.query_params.get('notes', 'true') == 'true'
         
-        user = db.query(User).filter(User.ic_number == user_ic).first()
-        # Start building the query with join
-        query = db.query(HighLights, Books).join(Books, HighLights.book_id == Books.id)
+        # Never fall through to an unfiltered scan of every user's highlights
+        if not user_ic:
+            res.status_code = 400
+            return {"success": False, "error": "user_id is required"}
+
+        user_id = db.query(User.id).filter(User.ic_number == user_ic).scalar()
+        if user_id is None:
+            res.status_code = 404
+            return {"success": False, "error": "User not found"}
+
+        # Start building the query with join, selecting plain columns instead of ORM entities
+        query = db.query(
+            HighLights.id,
+            HighLights.book_id,
+            HighLights.user_id,
+            HighLights.text,
+            HighLights.cfi,
+            HighLights.date,
+            HighLights.notes,
+            HighLights.tag,
+            HighLights.range,
+            HighLights.color,
+            HighLights.chapter,
+            HighLights.chapter_index,
+            HighLights.percentage,
+            HighLights.created_at,
+            HighLights.updated_at,
+            Books.title.label('book_title'),
+            Books.thumb_url.label('book_thumb_url'),
+            Books.language.label('book_language'),
+            Books.genres.label('book_genres'),
+        ).join(Books, HighLights.book_id == Books.id)
 
         # Apply filters
         if keyword:
@@ -43,10 +74,12 @@ async def getHighlights(
             )
         if book_id:
             query = query.filter(HighLights.book_id == book_id)
-        if user.id:
-            query = query.filter(HighLights.user_id == user.id)
+        query = query.filter(HighLights.user_id == user_id)
         if isNote:
-            query = query.filter(HighLights.notes != None, HighLights.notes != '')
+            # Served by the partial index ix_highlights_user_with_notes: the planner
+            # must be able to prove this filter implies its predicate, which
+            # length(notes) > 0 would not
+            query = query.filter(HighLights.notes.isnot(None), HighLights.notes != '')
         else:
             query = query.filter(or_(HighLights.notes == None, HighLights.notes == ''))
 
@@ -62,28 +95,28 @@ async def getHighlights(
         
         # Format results to include both highlight and book data
         highlights = []
-        for highlight, book in results:
+        for row in results:
             highlight_dict = {
-                "id": highlight.id,
-                "book_id": highlight.book_id,
-                "user_id": highlight.user_id,
-                "text": highlight.text,
-                "cfi": highlight.cfi,
-                "date": highlight.date,
-                "notes": highlight.notes,
-                "tag": highlight.tag,
-                "range": highlight.range,
-                "color": highlight.color,
-                "chapter": highlight.chapter,
-                "chapter_index": highlight.chapter_index,
-                "percentage": highlight.percentage,
-                "created_at": highlight.created_at,
-                "updated_at": highlight.updated_at,
+                "id": row.id,
+                "book_id": row.book_id,
+                "user_id": row.user_id,
+                "text": row.text,
+                "cfi": row.cfi,
+                "date": row.date,
+                "notes": row.notes,
+                "tag": row.tag,
+                "range": row.range,
+                "color": row.color,
+                "chapter": row.chapter,
+                "chapter_index": row.chapter_index,
+                "percentage": row.percentage,
+                "created_at": row.created_at,
+                "updated_at": row.updated_at,
                 "book": {
-                    "title": book.title,
-                    "thumb_url": book.thumb_url,
-                    "language": book.language,
-                    "genres": book.genres
+                    "title": row.book_title,
+                    "thumb_url": row.book_thumb_url,
+                    "language": row.book_language,
+                    "genres": row.book_genres
                 }
             }
             highlights.append(highlight_dict)
@@ -98,21 +131,25 @@ async def getHighlights(
         }
 
     except Exception as e:
-        print(f"Error getting highlights: {e}")
+        logger.error("Error getting highlights: %s", e)
         res.status_code = 500
         return {"success": False, "error": str(e)}
 
 
-@router.get("/getByUserIC/{user_ic}")
+@router.get("/getByUserIC/{user_ic}", response_model=HighlightListResponse, response_model_exclude_unset=True)
 async def getHighlightsByUserIC(user_ic: str, res: Response = Response(), db: Session = Depends(get_db)):
     try:
-        user = db.query(User).filter(User.ic_number == user_ic).first()
-        highlights = db.query(HighLights).filter(HighLights.user_id == user.id).all()
+        user_id = db.query(User.id).filter(User.ic_number == user_ic).scalar()
+        if user_id is None:
+            res.status_code = 404
+            return {"success": False, "error": "User not found"}
+
+        highlights = db.query(HighLights).filter(HighLights.user_id == user_id).all()
 
         return {"success": True, "data": highlights}
 
     except Exception as e:
-        print(f"Error getting highlights by user: {e}")
+        logger.error("Error getting highlights by user: %s", e)
         res.status_code = 500
         return {"success": False, "error": str(e)}
 
@@ -134,12 +171,15 @@ async def addHighlight(request: Request, res: Response = Response(), db: Session
         tag = body.get("tag")
         text = body.get("text")
 
-        user = db.query(User).filter(User.ic_number == user_ic).first()
+        user_id = db.query(User.id).filter(User.ic_number == user_ic).scalar()
+        if user_id is None:
+            res.status_code = 404
+            return {"success": False, "error": "User not found"}
 
         # Store in PostgreSQL
         pg_highlight = HighLights(
             book_id=book_id,
-            user_id=user.id,
+            user_id=user_id,
             text=text,
             cfi=cfi,
             date=date,
@@ -160,7 +200,7 @@ async def addHighlight(request: Request, res: Response = Response(), db: Session
             "data": pg_highlight
         }
     except Exception as e:
-        print(f"Error adding highlight: {e}")
+        logger.error("Error adding highlight: %s", e)
         res.status_code = 500
         return {"success": False, "error": str(e)}
     
@@ -179,32 +219,33 @@ async def deleteHighlight(highlight_id: str, res: Response = Response(), db: Ses
         return {"success": True, "data": highlight}
 
     except Exception as e:
-        print(f"Error deleting highlight: {e}")
+        logger.error("Error deleting highlight: %s", e)
         res.status_code = 500
         return {"success": False, "error": str(e)}
 
 @router.put("/{highlight_id}")
-async def updateHighlights(highlight_id: str, body: dict, res: Response = Response(), db: Session = Depends(get_db)):
+async def updateHighlights(highlight_id: str, patch: HighlightPatch, res: Response = Response(), db: Session = Depends(get_db)):
     try:
-        # Find the highlight in PostgreSQL
-        highlight = db.query(HighLights).filter(HighLights.id == highlight_id).first()
+        # Apply only the fields the client sent in a single UPDATE ... RETURNING
+        stmt = update(HighLights).where(
+            HighLights.id == highlight_id
+        ).values(
+            **patch.model_dump(exclude_unset=True),
+            updated_at=datetime.now()
+        ).returning(HighLights)
+        highlight = db.execute(stmt).scalar_one_or_none()
         if not highlight:
             res.status_code = 404
             return {"success": False, "error": "Highlight not found"}
 
-        # Update highlight fields from body
-        for key, value in body.items():
-            if hasattr(highlight, key):
-                setattr(highlight, key, value)
-
-        # Commit changes to database
+        # Serialize before commit expires the returned row
+        data = HighlightOut.model_validate(highlight).model_dump(exclude={"book"})
         db.commit()
-        db.refresh(highlight)
 
-        return {"success": True, "data": highlight}
+        return {"success": True, "data": data}
 
     except Exception as e:
-        print(f"Error updating highlight: {e}")
+        logger.error("Error updating highlight: %s", e)
         res.status_code = 500
         return {"success": False, "error": str(e)}
     
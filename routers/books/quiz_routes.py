@@ -1,13 +1,222 @@
-from fastapi import APIRouter, Request, Response, Depends
+import logging
+from fastapi import APIRouter, Request, Response, Depends, BackgroundTasks
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 import re
 import json
+import uuid
 from datetime import datetime
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from database.connection import get_db
+from database.connection import get_db, SessionLocal
 from database.models import Books, Quiz, User
+from services.cache import cache_get, cache_set, shared_cache_available
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# One shared client so concurrent quiz runs multiplex over a pooled HTTP/2 connection;
+# DefaultAsyncHttpxClient keeps the SDK's timeout and redirect defaults
+client = AsyncOpenAI(http_client=DefaultAsyncHttpxClient(http2=True, limits=httpx.Limits(max_connections=100)))
+
+# Fenced code blocks in the assistant reply
+_FENCE_RE = re.compile(r"```(.*?)```", re.DOTALL)
+_JSON_DECODER = json.JSONDecoder()
+
+QUIZ_PROMPT = """
+                           I'm building a book reading website. 
+                           generate 3 quizes based on book content. 
+                           The format should be          
+                           ```<"question": "xxx", "answer": [<"text": "aaa", "correct": "False">, <"text": "bbb", "correct": "True">]>```
+                           the option answers would be flexible from 3 and correct answer'index should be random, not always second. 
+
+                           The response should be logically correct according to the book content and languages should be same book language.
+                           in response, replace all "<" with curly bracket.
+                           Just only return the question.
+                        """
+QUIZ_INSTRUCTIONS = "Please answer the question simpler same language with associated file"
+QUIZ_JOB_TTL = 60 * 60  # seconds a quiz job status stays pollable
+# Job status lives in services.cache. Without REDIS_URL that is a per-process dict,
+# so with more than one worker a poll can land on a worker that never saw the job:
+# the /generate-quiz/jobs endpoints answer 503 in that setup instead
+
+
+def _quiz_jobs_unavailable():
+    """True when job status can't be shared between the app's worker processes"""
+    return settings.WEB_CONCURRENCY > 1 and not shared_cache_available()
+
+
+QUIZ_JOBS_UNAVAILABLE = {
+    "success": False,
+    "error": "Quiz jobs require REDIS_URL when running more than one worker"
+}
+
+
+def _iter_json_objects(text):
+    """Yield every top-level JSON object found in text, in a single pass"""
+    idx = text.find('{')
+    while idx != -1:
+        try:
+            obj, end = _JSON_DECODER.raw_decode(text, idx)
+        except json.JSONDecodeError:
+            idx = text.find('{', idx + 1)
+            continue
+        if isinstance(obj, dict):
+            yield obj
+        idx = text.find('{', end)
+
+
+def _build_quizzes(block, book_id, user_id):
+    """Build Quiz row mappings for every quiz object found in a fenced block"""
+    rows = []
+    for quiz_answer in _iter_json_objects(block):
+        if quiz_answer.get('question') or quiz_answer.get('answer'):
+            rows.append({
+                "book_id": book_id,
+                "user_id": user_id,
+                "question": quiz_answer.get('question', ''),
+                "answer": quiz_answer.get('answer', [])
+            })
+    return rows
+
+
+def _serialize_quiz(quiz):
+    """Shape a persisted quiz for the client, hiding which option is correct"""
+    return {
+        'question': quiz.question,
+        'answer': [answer['text'] for answer in quiz.answer],
+        'id': quiz.id,  # Add the quiz ID to the response
+    }
+
+
+def _insert_quizzes(rows, db: Session):
+    """Insert quiz rows in one executemany, bypassing the unit of work, and return them serialized"""
+    if not rows:
+        return []
+    inserted = db.execute(
+        insert(Quiz).returning(Quiz.id, Quiz.question, Quiz.answer, sort_by_parameter_order=True),
+        rows
+    ).all()
+    return [_serialize_quiz(quiz) for quiz in inserted]
+
+
+def _save_quizzes(rows, db: Session):
+    """Insert and commit quiz rows, returning them serialized"""
+    quizzes = _insert_quizzes(rows, db)
+    if quizzes:
+        db.commit()
+    return quizzes
+
+
+def _lookup_quiz_owner(book_id, user_ic, db: Session):
+    """Return (user_id, assistant_id) with two single-column lookups"""
+    user_id = db.query(User.id).filter(User.ic_number == user_ic).scalar()
+    if user_id is None:
+        raise ValueError(f"User {user_ic} not found")
+
+    assistant_id = db.query(Books.assistant_id).filter(Books.id == book_id).scalar()
+    if assistant_id is None:
+        raise ValueError(f"Book {book_id} not found")
+
+    return user_id, assistant_id
+
+
+async def _create_quiz_thread():
+    """Open an assistant thread holding the quiz generation prompt"""
+    thread = await client.beta.threads.create()
+    await client.beta.threads.messages.create(
+        thread_id=thread.id,
+        role="user",
+        content=[
+                {
+                    "type": "text",
+                    "text": QUIZ_PROMPT
+                },
+        ]
+    )
+    return thread.id
+
+
+async def _stream_quizzes(book_id, user_ic):
+    """Stream quizzes as server-sent events, persisting each one as soon as its block is complete"""
+    # The request-scoped session is closed before the body streams, so use our own.
+    # It is synchronous, so every call that touches the database runs in the threadpool
+    db = SessionLocal()
+    try:
+        user_id, assistant_id = await run_in_threadpool(_lookup_quiz_owner, book_id, user_ic, db)
+
+        buffer = ""
+        consumed = 0
+        async with client.beta.threads.runs.stream(
+            thread_id=await _create_quiz_thread(),
+            assistant_id=assistant_id,
+            instructions=QUIZ_INSTRUCTIONS
+        ) as stream:
+            async for delta in stream.text_deltas:
+                buffer += delta
+                match = _FENCE_RE.search(buffer, consumed)
+                while match:
+                    consumed = match.end()
+                    payloads = await run_in_threadpool(_save_quizzes, _build_quizzes(match.group(1), book_id, user_id), db)
+                    for payload in payloads:
+                        yield f'data: {json.dumps(payload, default=str)}\n\n'
+                    match = _FENCE_RE.search(buffer, consumed)
+    except Exception as e:
+        await run_in_threadpool(db.rollback)
+        logger.error("Error while streaming quiz: %s", e)
+        yield f'event: error\ndata: {json.dumps({"success": False, "data": "Error while generating quiz"})}\n\n'
+    finally:
+        await run_in_threadpool(db.close)
+
+
+async def _generate_quizzes(book_id, user_ic, db: Session):
+    """Run the quiz assistant to completion and persist the parsed quizzes"""
+    # db is a synchronous session; keep its round trips off the event loop
+    user_id, assistantId = await run_in_threadpool(_lookup_quiz_owner, book_id, user_ic, db)
+    threadId = await _create_quiz_thread()
+
+    res_message=""
+
+    run = await client.beta.threads.runs.create_and_poll(
+        thread_id=threadId,
+        assistant_id=assistantId,
+        instructions=QUIZ_INSTRUCTIONS
+    )
+
+    if run.status == 'completed':
+        messages = await client.beta.threads.messages.list(thread_id=run.thread_id, run_id=run.id)
+        for msg in messages.data:
+            if msg.role == "assistant":
+                for content_item in msg.content: 
+                    if content_item.type == 'text':
+                        res_message = content_item.text.value
+    
+    # Extract JSON objects from the answer_text and add them to quiz_list
+    rows = []
+    for block in _FENCE_RE.findall(res_message):
+        rows.extend(_build_quizzes(block, book_id, user_id))
+
+    # Persist all quizzes with a single bulk insert in one transaction
+    return await run_in_threadpool(_save_quizzes, rows, db)
+
+
+async def _run_quiz_job(job_id, book_id, user_ic):
+    """Background worker for a queued quiz job, using its own short-lived session"""
+    job_key = f"quiz_job:{job_id}"
+    await run_in_threadpool(cache_set, job_key, {"status": "running"}, QUIZ_JOB_TTL)
+    db = SessionLocal()
+    try:
+        quizzes = await _generate_quizzes(book_id, user_ic, db)
+        await run_in_threadpool(cache_set, job_key, {"status": "completed", "quizzes": quizzes}, QUIZ_JOB_TTL)
+    except Exception as e:
+        await run_in_threadpool(db.rollback)
+        logger.error("Error while generating quiz in job %s: %s", job_id, e)
+        await run_in_threadpool(cache_set, job_key, {"status": "failed", "error": "Error while generating quiz"}, QUIZ_JOB_TTL)
+    finally:
+        await run_in_threadpool(db.close)
 
-client = OpenAI()
 
 router = APIRouter(
     prefix="/api/ebooks",
@@ -21,98 +230,51 @@ async def generate_quiz(request: Request, db: Session = Depends(get_db)):
         book_id = data.get('book_id')
         user_ic = data.get('user_ic')
 
-        user = db.query(User).filter(User.ic_number == user_ic).first()
+        quizzes = await _generate_quizzes(book_id, user_ic, db)
+        return {"success": True, 'quizzes': quizzes}
 
-        book = db.query(Books).filter(Books.id == book_id).first()
-        
-        assistantId = book.assistant_id
-        thread = client.beta.threads.create()
-        threadId = thread.id
+    except Exception as e:
+        logger.error("Error while generating quiz: %s", e)
+        return {"success": False, "data": 'Error while generating quiz'}
 
-        res_message=""
+@router.post("/generate-quiz/stream")
+async def generate_quiz_stream(request: Request):
+    data = await request.json()
+    book_id = data.get('book_id')
+    user_ic = data.get('user_ic')
 
-        client.beta.threads.messages.create(
-            thread_id=threadId,
-            role="user",
-            content=[
-                    {
-                        "type": "text",
-                        "text": f"""
-                           I'm building a book reading website. 
-                           generate 3 quizes based on book content. 
-                           The format should be          
-                           ```<"question": "xxx", "answer": [<"text": "aaa", "correct": "False">, <"text": "bbb", "correct": "True">]>```
-                           the option answers would be flexible from 3 and correct answer'index should be random, not always second. 
+    # identity encoding keeps GZipMiddleware from buffering the events
+    response = StreamingResponse(_stream_quizzes(book_id, user_ic), media_type='text/event-stream', headers={'Content-Encoding': 'identity'})
+    return response
 
-                           The response should be logically correct according to the book content and languages should be same book language.
-                           in response, replace all "<" with curly bracket.
-                           Just only return the question.
-                        """
-                    },
-            ]
-        )
-
-        run = client.beta.threads.runs.create_and_poll(
-            thread_id=threadId,
-            assistant_id=assistantId,
-            instructions="Please answer the question simpler same language with associated file"
-        )
-
-        if run.status == 'completed':
-            print("Run completed successfully. Processing messages.")
-            messages = client.beta.threads.messages.list(thread_id=run.thread_id, run_id=run.id)
-            for msg in messages.data:
-                if msg.role == "assistant":
-                    for content_item in msg.content: 
-                        if content_item.type == 'text':
-                            text_value = content_item.text.value
-                            res_message=text_value
-                            response = f"Assistant says: {text_value}"
-                        else:
-                            response = "Assistant says: Unhandled content type."
-                else:
-                    response = f"User says: {msg.content}"
-                    print(f"Processing user message: {response}")
-        
-        # Extract JSON objects from the answer_text and add them to quiz_list
-        pattern = r'```(.*?)```'  # Define regex pattern to match code enclosed in ```
-        matches = re.findall(pattern, res_message, re.DOTALL)  # Find all matches of the pattern
-        quizzes = []
-        
-        for quiz_answer in matches:
-            json_pattern = r'\{.*\}'
-
-            # Use re.search to find the JSON object in the string
-            match = re.search(json_pattern, quiz_answer, re.DOTALL)
-
-            if match:
-                quiz_answer = json.loads(match.group())
-
-                if quiz_answer['question'] or quiz_answer['answer']:
-                    quiz = {"question": "", "answer": [], 'id': ''}
-
-                    # Create new quiz in database
-                    new_quiz = Quiz(
-                        book_id=book.id,
-                        user_id=user.id,
-                        question=quiz_answer['question'],
-                        answer=quiz_answer['answer']
-                    )
-                    db.add(new_quiz)
-                    db.commit()
-                    db.refresh(new_quiz)
-
-                    quiz['question'] = quiz_answer['question']
-                    quiz['id'] = new_quiz.id  # Add the quiz ID to the response
-
-                    for answer in quiz_answer['answer']:   
-                        quiz['answer'].append(answer['text'])
-                quizzes.append(quiz)
-        return {"success": True, 'quizzes': quizzes}
+@router.post("/generate-quiz/jobs", status_code=202)
+async def enqueue_quiz_job(request: Request, background_tasks: BackgroundTasks, res: Response):
+    if _quiz_jobs_unavailable():
+        res.status_code = 503
+        return QUIZ_JOBS_UNAVAILABLE
 
-    except Exception as e:
-        print(f"Error while generating quiz: {e}")
-        return {"success": False, "data": 'Error while generating quiz'}
+    data = await request.json()
+    book_id = data.get('book_id')
+    user_ic = data.get('user_ic')
+
+    job_id = str(uuid.uuid4())
+    await run_in_threadpool(cache_set, f"quiz_job:{job_id}", {"status": "pending"}, QUIZ_JOB_TTL)
+    background_tasks.add_task(_run_quiz_job, job_id, book_id, user_ic)
+
+    return {"success": True, "job_id": job_id, "status": "pending"}
+
+@router.get("/generate-quiz/jobs/{job_id}")
+async def get_quiz_job(job_id: str, res: Response = Response()):
+    if _quiz_jobs_unavailable():
+        res.status_code = 503
+        return QUIZ_JOBS_UNAVAILABLE
+
+    job = await run_in_threadpool(cache_get, f"quiz_job:{job_id}")
+    if job is None:
+        res.status_code = 404
+        return {"success": False, "error": "Quiz job not found"}
+
+    return {"success": True, "job_id": job_id, **job}
 
 @router.post("/submit-answer")
 async def answer_quiz(request: Request, db: Session = Depends(get_db)):
@@ -122,16 +284,25 @@ async def answer_quiz(request: Request, db: Session = Depends(get_db)):
     score = 0
     result = []
 
+    # Load every quiz referenced by the submission in one round-trip, off the event loop
+    quiz_ids = [answer.get('quizId') for answer in answers]
+    quizzes = {
+        str(quiz.id): quiz
+        for quiz in await run_in_threadpool(db.query(Quiz).filter(Quiz.id.in_(quiz_ids)).all)
+    }
+
     for answer in answers:
-        quiz_id = answer.get('quizId')
+        quiz = quizzes.get(str(answer.get('quizId')))
         user_answer_index = int(answer.get('answer'))
 
-        quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+        is_correct = False
+        if quiz and 0 <= user_answer_index < len(quiz.answer):
+            # The assistant may store the flag either as a JSON boolean or as "True"
+            correct_flag = quiz.answer[user_answer_index].get("correct")
+            is_correct = correct_flag is True or str(correct_flag).lower() == "true"
 
-        if quiz and quiz.answer[user_answer_index]["correct"] == 'True':
-            result.append(True)
+        result.append(is_correct)
+        if is_correct:
             score += 1
-        else:
-            result.append(False)
-    
-    return {"success": True, "score": score, "result": result}
\ No newline at end of file
+
+    return {"success": True, "score": score, "result": result}
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Path, Body, Query, File, UploadFile, Depends
+from fastapi import APIRouter, Path, Body, Query, File, UploadFile, Depends, Response
 from sqlalchemy.orm import Session
 from dependencies import get_db_session
 from controllers.books_controller import (
@@ -10,20 +10,33 @@ from controllers.books_controller import (
     delete_bulk_books,
     get_books_analytics,
     upload_book,
-    get_books_by_status
+    get_books_by_status,
+    decode_book_cursor
 )
 
 router = APIRouter(prefix="/api/books", tags=["books"])
 
 @router.get("/", summary="Get all books")
 def route_get_all_books(
+    response: Response,
     page: int = Query(1, ge=1, description="Page number"),
     perPage: int = Query(20, ge=1, le=100, description="Number of items per page"),
     status: str = Query(None, description="Filter by book status"),
+    cursor: str = Query(None, description="next_cursor from the previous page; takes precedence over page"),
     db: Session = Depends(get_db_session)
 ):
     """Get all books with pagination and optional status filtering"""
-    return get_all_books(db=db, page=page, limit=perPage, status=status)
+    try:
+        after = decode_book_cursor(cursor) if cursor else None
+    except ValueError:
+        response.status_code = 400
+        return {
+            "success": False,
+            "data": None,
+            "message": "Invalid cursor; pass next_cursor from the previous page",
+            "error": "INVALID_CURSOR"
+        }
+    return get_all_books(db=db, page=page, limit=perPage, status=status, after=after)
 
 @router.get("/by_id/{book_id}", summary="Get one book by ID")
 def route_get_book_by_id(
@@ -16,5 +16,6 @@ async def sse_request(request: Request):
     defaultInput = data.get('defaultInput')
     
     
-    response = StreamingResponse(get_response(messages, defaultInput, True), media_type='text/event-stream')
+    # identity encoding keeps GZipMiddleware from buffering the events
+    response = StreamingResponse(get_response(messages, defaultInput, True), media_type='text/event-stream', headers={'Content-Encoding': 'identity'})
     return response
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Path, Body, Query, Depends
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from dependencies import get_db_session
 from controllers.schools_controller import (
@@ -9,6 +10,7 @@ from controllers.schools_controller import (
     delete_school,
     delete_bulk_schools,
     get_schools_analytics,
+    stream_schools_analytics,
     get_schools_by_status,
     get_school_analytics_by_id,
     get_school_leaderboard_controller
@@ -122,6 +124,21 @@ def route_get_schools_analytics(
     """
     return get_schools_analytics(db, page, perPage, name, state, city, sort)
 
+@router.get("/analytics/export", summary="Export schools analytics")
+def route_export_schools_analytics(
+    name: Optional[str] = Query(None, description="Filter by school name (partial match)"),
+    state: Optional[str] = Query(None, description="Filter by school state (partial match)"),
+    city: Optional[str] = Query(None, description="Filter by school city (partial match)"),
+    sort: Optional[str] = Query(None, description="Sort parameters as JSON string (e.g., '[{\"id\":\"school_name\",\"desc\":true}]')")
+):
+    """Stream the analytics of every matching school as newline-delimited JSON
+    
+    Takes the same filters and sort as the analytics endpoint, without pagination.
+    Each line is one school in the analytics row structure. If the export fails
+    part way, the last line is an error object with "success": false instead.
+    """
+    return StreamingResponse(stream_schools_analytics(name, state, city, sort), media_type="application/x-ndjson")
+
 @router.get("/{school_id}/analytics", summary="Get single school analytics")
 def route_get_school_analytics_by_id(
     school_id: str = Path(..., description="School ID"),
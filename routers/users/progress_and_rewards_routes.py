@@ -1,18 +1,32 @@
+import logging
 from fastapi import APIRouter, Request, Response, Depends
+from fastapi.responses import ORJSONResponse
 from datetime import datetime
+from dateutil import parser
 from services.books import add_reading_history, get_reading_history_by_user_ic, get_top_readers, get_top_reading_time, get_top_quiz_scores
-from sqlalchemy.orm import Session
-from database.connection import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.connection import get_async_db
 from database.models import User, Rewards
-from sqlalchemy import desc
+from sqlalchemy import desc, func, insert, select
+from services.cache import cache_get_async, cache_set_async
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/api/ebooks",
     tags=["progress_and_rewards"],
 )
 
+LEADERBOARD_TTL = 45  # seconds a leaderboard variant is served from cache
+LEADERBOARD_MAX_LIMIT = 100
+LEADERBOARDS = {
+    'read_books': get_top_readers,
+    'read_time': get_top_reading_time,
+    'quiz_scores': get_top_quiz_scores,
+}
+
 @router.post("/reading_progress/add")
-async def add_reading_progress(request: Request, res: Response = Response(), db: Session = Depends(get_db) ):
+async def add_reading_progress(request: Request, res: Response = Response(), db: AsyncSession = Depends(get_async_db) ):
     try:
         body = await request.json()
 
@@ -23,103 +37,115 @@ async def add_reading_progress(request: Request, res: Response = Response(), db:
         duration = body.get("duration")
         score = body.get("score")
 
-        user = db.query(User).filter(User.ic_number == user_ic).first()
-
         if not all([user_ic, book_id, percentage, started_time]):
             res.status_code = 400
             return {"success": False, "error": "Missing required fields"}
 
-        add_reading_history(user.id, book_id, percentage, started_time, duration, score, db)
+        user_id = (await db.execute(select(User.id).where(User.ic_number == user_ic))).scalar_one_or_none()
+        if user_id is None:
+            res.status_code = 404
+            return {"success": False, "error": "User not found"}
+
+        # asyncpg only binds real datetimes; drop the offset like a timestamp column cast would
+        started_time = parser.isoparse(started_time).replace(tzinfo=None)
+
+        # The reading history service is synchronous; run it on the session's sync facade
+        await db.run_sync(lambda session: add_reading_history(user_id, book_id, percentage, started_time, duration, score, session))
 
         return {"success": True, "data": "ok"}
     except Exception as e:
-        print(f"Error adding reading progress: {e}")
+        logger.error("Error adding reading progress: %s", e)
         res.status_code = 500
         return {"success": False, "error": str(e)}
 
 @router.get("/reading_progress/{user_ic}")
-async def get_reading_progress(user_ic: str, request: Request, res: Response = Response(), db: Session = Depends(get_db)):
+async def get_reading_progress(user_ic: str, request: Request, res: Response = Response(), db: AsyncSession = Depends(get_async_db)):
     try:
         page = int(request.query_params.get('page', 1))
         limit = int(request.query_params.get('limit', 5))
-        return {"success": True, "data": get_reading_history_by_user_ic(user_ic, page, limit, db)}
+        data = await db.run_sync(lambda session: get_reading_history_by_user_ic(user_ic, page, limit, session))
+        return {"success": True, "data": data}
     except Exception as e:
-        print(f"Error getting reading progress: {e}")
+        logger.error("Error getting reading progress: %s", e)
         return {"success": False, "error": str(e)}
 
 @router.get("/leaderboard/get")
-async def get_leaderboard(request: Request, res: Response = Response(), db: Session = Depends(get_db)):
+async def get_leaderboard(request: Request, res: Response = Response(), db: AsyncSession = Depends(get_async_db)):
     try:
         org = request.query_params.get('org', 'read_books')
-        group = request.query_params.get('group', 'student')
-        limit = int(request.query_params.get('limit', 3))
+        # Normalise the query so the cache only ever sees 2 groups x 100 limits per org
+        group = 'school' if request.query_params.get('group') == 'school' else 'student'
+        limit = min(max(int(request.query_params.get('limit', 3)), 1), LEADERBOARD_MAX_LIMIT)
         
-        if(org == 'read_books'):
-             leaderboardData = get_top_readers(db, group, limit)
-             return {"success": True, "data": leaderboardData}
-        elif(org == 'read_time'):
-             leaderboardData = get_top_reading_time(db, group, limit)
-             return {"success": True, "data": leaderboardData}
-        elif (org == 'quiz_scores'):
-            leaderboardData = get_top_quiz_scores(db, group, limit)
-            return {"success": True, "data": leaderboardData}
+        get_top = LEADERBOARDS.get(org)
+        if get_top:
+            cache_key = f"lb:{org}:{group}:{limit}"
+            leaderboardData = await cache_get_async(cache_key)
+            if leaderboardData is None:
+                leaderboardData = await db.run_sync(get_top, group, limit)
+                await cache_set_async(cache_key, leaderboardData, LEADERBOARD_TTL)
+            # JSON-native rows, so skip jsonable_encoder and serialize with orjson directly
+            return ORJSONResponse({"success": True, "data": leaderboardData})
         
        
     except Exception as e:
-        print(f"Error getting leaderboard: {e}")
+        logger.error("Error getting leaderboard: %s", e)
         return {"success": False, "error": str(e)}
 
 @router.post("/reward/add")
-async def add_reward(request: Request, res: Response = Response(), db: Session = Depends(get_db)):
+async def add_reward(request: Request, res: Response = Response(), db: AsyncSession = Depends(get_async_db)):
     try:
         body = await request.json()
 
-        description = body.get("description")
         badge = body.get("imageUrl")
         title = body.get("name")
         condition = [{"field": key, "limit": value} for key, value in body.get("requirements").items()]
         status = body.get("status")
 
-        new_reward = Rewards(
-            title=title,
-            description=description,
-            badge=badge,
-            condition=condition,
-            status=status
-        )
-
-        db.add(new_reward)
-        db.commit()
-        db.refresh(new_reward)
+        # INSERT ... RETURNING hands back the row with its generated defaults in one round trip
+        new_reward = (await db.execute(
+            insert(Rewards).values(
+                title=title,
+                badge=badge,
+                condition=condition,
+                status=status
+            ).returning(Rewards)
+        )).scalar_one()
+        await db.commit()
 
         return {"success": True, "data": new_reward}
     except Exception as e:
-        print(f"Error adding reward: {e}")
+        logger.error("Error adding reward: %s", e)
         res.status_code = 500
         return {"success": False, "error": str(e)}
     
 @router.get("/reward/list")
-async def getAllRewards(request: Request, res: Response = Response(), db: Session = Depends(get_db)):
+async def getAllRewards(request: Request, res: Response = Response(), db: AsyncSession = Depends(get_async_db)):
     try:
         page = int(request.query_params.get('page', 1))
         limit = int(request.query_params.get('limit', 10))
         keyword = request.query_params.get('keyword', '').lower()
 
         # Base query
-        query = db.query(Rewards)
+        query = select(Rewards)
 
         # Apply keyword filter if provided
         if keyword:
-            query = query.filter(Rewards.title.ilike(f'%{keyword}%'))
-
-        # Get total count
-        total = query.count()
-
-        # Apply pagination
-        rewards = query.order_by(desc(Rewards.created_at))\
-            .offset((page - 1) * limit)\
-            .limit(limit)\
-            .all()
+            query = query.where(Rewards.title.ilike(f'%{keyword}%'))
+
+        # Fetch the page and the total match count in one round trip
+        rows = (await db.execute(
+            query.add_columns(func.count().over().label('total'))
+            .order_by(desc(Rewards.created_at))
+            .offset((page - 1) * limit)
+            .limit(limit)
+        )).all()
+        rewards = [row.Rewards for row in rows]
+        total = rows[0].total if rows else 0
+
+        # A page past the end has no rows to carry the total
+        if not rows and page > 1:
+            total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar()
 
         return {
             "success": True, 
@@ -129,6 +155,6 @@ async def getAllRewards(request: Request, res: Response = Response(), db: Sessio
             "limit": limit
         }
     except Exception as e:
-        print(f"Error getting rewards: {e}")
+        logger.error("Error getting rewards: %s", e)
         res.status_code = 500
         return {"success": False, "error": str(e)}
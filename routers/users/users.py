@@ -1,18 +1,26 @@
+import logging
 from fastapi import APIRouter, File, UploadFile, Request, Response, BackgroundTasks, Depends
+from fastapi.concurrency import run_in_threadpool
+from boto3.s3.transfer import TransferConfig
 from openai import OpenAI
-from services.aws_resources import S3_CLIENT, region, cognito
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from database.connection import get_db
+from services.aws_resources import get_s3_client, region
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import ARRAY, any_, cast, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import UUID, insert as pg_insert
+from database.connection import get_async_db
 from database.models import User, Rewards, ReadingHistory, Books, School
-from collections import Counter
+import numpy as np
 from dateutil import parser
+import asyncio
 import os
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 client = OpenAI()
 
 BUCKET_NAME = "primary-school-ebook-data"
+AVATAR_TRANSFER_CONFIG = TransferConfig(multipart_threshold=5 * 1024 * 1024, max_concurrency=4, use_threads=True)
 
 router = APIRouter(
     prefix="/api/users",
@@ -21,128 +29,176 @@ router = APIRouter(
 
 # user
 @router.get("/list")
-async def get_users(request: Request, res: Response = Response(), db: Session = Depends(get_db)):
+async def get_users(request: Request, res: Response = Response(), db: AsyncSession = Depends(get_async_db)):
     try:
-        # response = ic_numbers_table.scan()
-        # icNumbers = response.get('Items', [])
-
-        response = cognito.list_users(
-            UserPoolId='ap-southeast-2_88E6gZpZz'
-        )
-        users = response['Users']
+        page = int(request.query_params.get('page', 1))
+        limit = int(request.query_params.get('limit', 60))
+        keyword = request.query_params.get('keyword', '')
+
+        # Users live in Postgres; page through them there (with the school name
+        # joined in) instead of listing the whole Cognito pool on every request
+        query = select(
+            User.ic_number,
+            User.created_at,
+            User.registration_status,
+            User.rewards,
+            User.name,
+            User.avatar_url,
+            School.name.label('school_name'),
+            func.count().over().label('total')
+        ).outerjoin(School, User.school_id == School.id)
+
+        if keyword:
+            query = query.where(or_(User.name.ilike(f'%{keyword}%'), User.ic_number.ilike(f'%{keyword}%')))
+
+        users = (await db.execute(
+            query.order_by(User.created_at.desc())
+            .offset((page - 1) * limit)
+            .limit(limit)
+        )).all()
 
         fullUserData = []
         for user in users:
-            # Get school name if school_id exists
-            school_name = None
-            if user.school_id:
-                school = db.query(School).filter(School.id == user.school_id).first()
-                school_name = school.name if school else None
-            
             user_data = {
                 "icNumber": user.ic_number,
                 "createdAt": user.created_at.isoformat() if user.created_at else '',
                 "registrationStatus": user.registration_status,
                 "rewards": user.rewards if user.rewards else [],
                 "name": user.name,
-                "school": school_name,
+                "school": user.school_name,
                 "avatar_url": user.avatar_url
             }
             fullUserData.append(user_data)
                 
-        return {"success": True, "data": fullUserData}
+        return {
+            "success": True,
+            "data": fullUserData,
+            "total": users[0].total if users else 0,
+            "page": page,
+            "limit": limit
+        }
     
     except Exception as e:
-        print(f"Error retrieving from database: {e}")
+        logger.error("Error retrieving from database: %s", e)
         return {"success": False, "data": 'Error retrieving from database'}
 
 @router.post("/user/add")
-async def add_user(request: Request, res: Response = Response(), db: Session = Depends(get_db)):
+async def add_user(request: Request, res: Response = Response(), db: AsyncSession = Depends(get_async_db)):
     try:
         body = await request.json()
         ic_number = body.get("icNumber")
 
-        existing_user = db.query(User).filter(User.ic_number == ic_number).first()
-        if existing_user:
+        # The unique ic_number index decides duplicates atomically; nothing is returned on conflict
+        new_user_id = (await db.execute(
+            pg_insert(User)
+            .values(ic_number=ic_number, registration_status='APPROVED', created_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=[User.ic_number])
+            .returning(User.id)
+        )).scalar_one_or_none()
+        if new_user_id is None:
             return {"success": False, "data": 'Duplicate icNumber found'}
-
-        new_user = User(
-            ic_number=ic_number,
-            registration_status='APPROVED',
-            created_at=datetime.utcnow()
-        )
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
         
         return {"success": True, "data": 'User added successfully'}
     except Exception as e:
-        print(f"Error adding user to database: {e}")
+        logger.error("Error adding user to database: %s", e)
         return {"success": False, "data": 'Error adding user to database'}
 
 @router.post("/user/upload_avatar/{user_ic}")
-async def upload_avatar(user_ic: str, file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def upload_avatar(user_ic: str, file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
     # generate filename from origin filename and timestamp
     current_timestamp = datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
     filename = file.filename.replace(' ', '-')
     s3_file_key = f"user_avatar/{current_timestamp}_{filename}"
 
-    # save file on local
+    avatar_url = f"https://{BUCKET_NAME}.s3.{region}.amazonaws.com/{s3_file_key}"
+
+    # stream the spooled upload to S3 in parts instead of reading it into memory;
+    # the transfer blocks, so keep it off the event loop. The avatar_url UPDATE
+    # doesn't depend on it, so run both concurrently and only commit once S3 succeeded
     try:
-        file_data = file.file.read()
-        
-        S3_CLIENT.put_object(Bucket=BUCKET_NAME, Key=s3_file_key,  Body=file_data)
-        avatar_url = f"https://{BUCKET_NAME}.s3.{region}.amazonaws.com/{s3_file_key}"
-    except Exception as e:
-        print(e)
-        return {"success": False, "data": 'error occurred while upload to S3 Bucket'}
+        upload_result, update_result = await asyncio.gather(
+            run_in_threadpool(get_s3_client().upload_fileobj, file.file, BUCKET_NAME, s3_file_key, Config=AVATAR_TRANSFER_CONFIG),
+            db.execute(update(User).where(User.ic_number == user_ic).values(avatar_url=avatar_url).returning(User.id)),
+            return_exceptions=True
+        )
     finally:
         file.file.close()
 
-    user = db.query(User).filter(User.ic_number == user_ic).first()
-    if user:
-        user.avatar_url = avatar_url
-        db.commit()
-        db.refresh(user)
+    if isinstance(upload_result, Exception):
+        await db.rollback()
+        logger.error("Error uploading avatar to S3: %s", upload_result)
+        return {"success": False, "data": 'error occurred while upload to S3 Bucket'}
 
-    return {"success": True, "data": avatar_url}
+    if isinstance(update_result, Exception):
+        await db.rollback()
+        logger.error("Error updating avatar_url: %s", update_result)
+        error = 'Error updating avatar'
+    elif update_result.first():
+        await db.commit()
+        return {"success": True, "data": avatar_url}
+    else:
+        await db.rollback()
+        error = 'User not found'
+
+    # Nothing points at the uploaded object, so don't leave it behind
+    await run_in_threadpool(_delete_avatar, s3_file_key)
+    return {"success": False, "data": error}
+
+def _delete_avatar(key: str):
+    try:
+        get_s3_client().delete_object(Bucket=BUCKET_NAME, Key=key)
+    except Exception as s3_error:
+        logger.error("Error deleting file from S3: %s", s3_error)
+
+def _avatar_key(avatar_url: str):
+    """S3 key of an uploaded avatar: the path after the bucket host, e.g. user_avatar/<ts>_<name>"""
+    _, sep, key = avatar_url.partition(".amazonaws.com/")
+    return key if sep else None
 
 @router.delete("/user/{icNumber}")
-async def delete_user(icNumber: str, res: Response = Response(), db: Session = Depends(get_db)):
+async def delete_user(icNumber: str, background_tasks: BackgroundTasks, res: Response = Response(), db: AsyncSession = Depends(get_async_db)):
     try:
-        user = db.query(User).filter(User.ic_number == icNumber).first()
-        if user:
-            db.delete(user)
-            db.commit()
-            
+        # DELETE ... RETURNING removes the row and hands back its avatar in one round trip
+        deleted = (await db.execute(
+            delete(User).where(User.ic_number == icNumber).returning(User.id, User.avatar_url)
+        )).first()
+        if deleted:
+            await db.commit()
+
             # Delete the file from S3 bucket if it exists
-            if user.avatar_url:
-                try:
-                    S3_CLIENT.delete_object(Bucket=BUCKET_NAME, Key=icNumber)
-                except Exception as s3_error:
-                    print(f"Error deleting file from S3: {s3_error}")
-            
+            avatar_key = _avatar_key(deleted.avatar_url) if deleted.avatar_url else None
+            if avatar_key:
+                background_tasks.add_task(_delete_avatar, avatar_key)
+
             return {"success": True, "data": icNumber}
         return {"success": False, "data": 'User not found'}
         
     except Exception as e:
-        print(f"Error deleting user from database: {e}")
+        await db.rollback()
+        logger.error("Error deleting user from database: %s", e)
         return {"success": False, "data": 'Error deleting user from database'}
 
 @router.get("/user/{user_ic}")
-async def get_user_by_ic(user_ic: str, res: Response = Response(), db: Session = Depends(get_db)):
+async def get_user_by_ic(user_ic: str, res: Response = Response(), db: AsyncSession = Depends(get_async_db)):
     try:
-        user = db.query(User).filter(User.ic_number == user_ic).first()
-        if not user:
+        # users.rewards is an array of reward ids; join on it so the user and
+        # their rewards come back in a single round trip
+        rows = (await db.execute(
+            select(User, Rewards)
+            .outerjoin(Rewards, Rewards.id == any_(cast(User.rewards, ARRAY(UUID(as_uuid=True)))))
+            .where(User.ic_number == user_ic)
+        )).all()
+        if not rows:
             return {"success": False, "data": 'User not found'}
             
-        rewards = []
-        if user.rewards:
-            rewards = db.query(Rewards).filter(Rewards.id.in_(user.rewards)).all()
+        user = rows[0].User
+        # Key by id so a reward repeated in users.rewards is returned once
+        rewards = list({row.Rewards.id: row.Rewards for row in rows if row.Rewards is not None}.values())
             
         return {"success": True, "data": {"user": user, "rewards": rewards}}
     except Exception as e:
-        print(f"Error retrieving user from database: {e}")
+        logger.error("Error retrieving user from database: %s", e)
         return {"success": False, "data": 'Error retrieving user from database'}
 
 # reading_progress
@@ -166,17 +222,24 @@ async def get_user_by_ic(user_ic: str, res: Response = Response(), db: Session =
 #         print(f"Error retrieving from database: {e}")
 #         return {"success": False, "data": 'Error retrieving from database'}
 
+def _reading_hour(time):
+    # fromisoformat is C-level; only non-ISO strings pay for dateutil's parser
+    try:
+        return datetime.fromisoformat(time).hour
+    except ValueError:
+        return parser.parse(time).hour
+
 def analyze_reading_times(reading_times):
-    # Convert reading times to datetime objects and extract the hour
-    hours = [parser.parse(time).hour for time in reading_times]
+    # Extract the (wall clock) hour of every reading time
+    hours = np.fromiter((_reading_hour(time) for time in reading_times), dtype=np.int64, count=len(reading_times))
 
     # Count the frequency of each hour
-    hour_counts = Counter(hours)
+    hour_counts = np.bincount(hours, minlength=24)
 
-    # Determine the most common reading hours
-    most_common_hours = hour_counts.most_common(3)  # Get top 3 most common hours
+    # Determine the top 3 most common reading hours; ties go to the earlier hour
+    most_common_hours = [hour for hour in np.argsort(-hour_counts, kind='stable')[:3] if hour_counts[hour]]
 
     # Format the result
-    preferred_times = [f"{hour}:00" for hour, _ in most_common_hours]
+    preferred_times = [f"{hour}:00" for hour in most_common_hours]
 
-    return preferred_times
\ No newline at end of file
+    return preferred_times
@@ -1,8 +1,12 @@
-from typing import Optional
+from typing import Any, List, Optional
 from uuid import UUID
-from pydantic import BaseModel, EmailStr, validator
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, EmailStr, validator
 import re
 
+# Digits with an optional leading + and common separators; linear-time, no nested repetition
+_PHONE_RE = re.compile(r'^\+?[\d\s\-\(\)]+$')
+
 class UserLoginRequest(BaseModel):
     identifier: str  # Can be email or ic_number
     password: str
@@ -19,7 +23,7 @@ class UserSignupRequest(BaseModel):
     @validator('phone')
     def validate_phone(cls, v):
         # Basic phone validation - can be enhanced based on your requirements
-        if not re.match(r'^\+?[\d\s\-\(\)]+$', v):
+        if not _PHONE_RE.match(v):
             raise ValueError('Invalid phone number format')
         return v
     
@@ -66,3 +70,52 @@ class UserProfileResponse(BaseModel):
     created_at: Optional[str]
     updated_at: Optional[str]
 
+
+class HighlightBookOut(BaseModel):
+    title: Optional[str] = None
+    thumb_url: Optional[str] = None
+    language: Optional[str] = None
+    genres: Optional[List[str]] = None
+
+class HighlightOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: UUID
+    book_id: Optional[UUID] = None
+    user_id: Optional[UUID] = None
+    highlight: Optional[str] = None
+    text: Optional[str] = None
+    cfi: Optional[str] = None
+    date: Optional[Any] = None
+    notes: Optional[str] = None
+    tag: Optional[List[str]] = None
+    range: Optional[str] = None
+    color: Optional[int] = None
+    chapter: Optional[int] = None
+    chapter_index: Optional[int] = None
+    percentage: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    book: Optional[HighlightBookOut] = None
+
+class HighlightPatch(BaseModel):
+    """Fields a client may change on an existing highlight"""
+    text: Optional[str] = None
+    cfi: Optional[str] = None
+    date: Optional[Any] = None
+    notes: Optional[str] = None
+    tag: Optional[List[str]] = None
+    range: Optional[str] = None
+    color: Optional[int] = None
+    chapter: Optional[int] = None
+    chapter_index: Optional[int] = None
+    percentage: Optional[str] = None
+
+class HighlightListResponse(BaseModel):
+    success: bool
+    data: Optional[List[HighlightOut]] = None
+    total: Optional[int] = None
+    page: Optional[int] = None
+    limit: Optional[int] = None
+    has_more: Optional[bool] = None
+    error: Optional[str] = None
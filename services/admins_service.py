@@ -10,12 +10,17 @@ import re
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Canonical hyphenated UUID; screens out malformed ids before uuid.UUID() has to raise
+_UUID_RE = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.I)
+
 def is_valid_uuid(uuid_string):
     """Validate if a string is a valid UUID format"""
     try:
         # Accept already-parsed UUID objects
         if isinstance(uuid_string, uuid.UUID):
             return True
+        if not isinstance(uuid_string, str) or not _UUID_RE.match(uuid_string):
+            return False
         uuid.UUID(uuid_string)
         return True
     except ValueError:
@@ -28,15 +33,26 @@ def parse_uuid_or_none(value):
         return None
     if isinstance(value, uuid.UUID):
         return value
+    value = str(value)
+    if not _UUID_RE.match(value):
+        return None
     try:
-        return uuid.UUID(str(value))
+        return uuid.UUID(value)
     except (ValueError, TypeError):
         return None
 
 
-def get_all_admins(db: Session):
+def get_all_admins(db: Session, detail: bool = False):
     try:
-        return db.query(Admin).options(joinedload(Admin.school)).all()
+        if detail:
+            return db.query(Admin).options(joinedload(Admin.school)).all()
+        # List views only render these columns, so skip loading full Admin/School rows
+        return db.query(
+            Admin.id,
+            Admin.email,
+            Admin.name,
+            School.name.label("school_name"),
+        ).outerjoin(School, Admin.school_id == School.id).all()
     except Exception as e:
         db.rollback()
         return None
@@ -60,14 +76,15 @@ def get_admin_by_email(email: str, db: Session):
 
 def add_admin(admin_data: dict, db: Session):
     try:
+        now = datetime.now()
         new_admin = Admin(
             id=admin_data.get("id", uuid.uuid4()),
             email=admin_data["email"],
             status=admin_data.get("status", "pending"),
             role=admin_data.get("role", "school_manager"),
             current_role=admin_data.get("current_role", admin_data.get("role", "school_manager")),
-            createdAt=datetime.now(),
-            updatedAt=datetime.now(),
+            createdAt=now,
+            updatedAt=now,
             name=admin_data.get("name", ""),
             school_id=parse_uuid_or_none(admin_data.get("school_id")),
         )
@@ -82,85 +99,67 @@ def add_admin(admin_data: dict, db: Session):
 
 def update_admin(admin_id: str, admin_data: dict, db: Session):
     try:
-        logger.info(f"Attempting to update admin with ID: {admin_id}")
-        logger.info(f"Admin data to update: {admin_data}")
+        logger.debug("Updating admin %s with %s", admin_id, admin_data)
         
         # Validate UUID format before querying database
         if not is_valid_uuid(admin_id):
-            logger.error(f"Invalid UUID format provided: {admin_id}")
-            logger.error(f"UUID should be in format: xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx")
+            logger.error("Invalid UUID format provided: %s", admin_id)
             return None
         
         admin = db.query(Admin).filter(Admin.id == admin_id).first()
         if not admin:
-            logger.warning(f"Admin with ID {admin_id} not found")
+            logger.warning("Admin with ID %s not found", admin_id)
             return None
-            
-        logger.info(f"Found admin: {admin.email} (ID: {admin.id})")
         
-        # Log which fields are being updated
-        updated_fields = []
+        # Per-field change descriptions are only built when debug logging is on
+        debug = logger.isEnabledFor(logging.DEBUG)
+        updated_count = 0
         for key, value in admin_data.items():
             # Skip unknown fields
             if not hasattr(admin, key):
-                logger.warning(f"Field '{key}' does not exist on Admin model, skipping")
+                logger.warning("Field '%s' does not exist on Admin model, skipping", key)
                 continue
 
             # Prevent updating immutable/system fields directly
             if key in {"id", "createdAt", "updatedAt"}:
-                logger.info(f"Skipping immutable field '{key}'")
                 continue
 
             # Special handling for relationship/foreign key fields
             if key == "school":
                 # Do not assign raw strings to relationship; skip unless provided as None to clear
                 if value in (None, ""):
-                    old_value = admin.school
+                    if debug:
+                        logger.debug("Updating field school: %s -> None", admin.school)
                     admin.school = None
-                    updated_fields.append(f"school: {old_value} -> None")
-                    logger.info(f"Updating field school: {old_value} -> None")
-                else:
-                    logger.info("Skipping direct assignment to 'school' relationship; provide 'school_id' to update")
+                    updated_count += 1
                 continue
 
             if key == "school_id":
-                old_value = admin.school_id
                 parsed_uuid = parse_uuid_or_none(value)
+                if debug:
+                    logger.debug("Updating field school_id: %s -> %s", admin.school_id, parsed_uuid)
                 admin.school_id = parsed_uuid
                 if parsed_uuid is None:
                     # Also clear relationship if FK cleared
                     admin.school = None
-                updated_fields.append(f"school_id: {old_value} -> {parsed_uuid}")
-                logger.info(f"Updating field school_id: {old_value} -> {parsed_uuid}")
+                updated_count += 1
                 continue
 
             # Default: direct assignment for scalar fields
-            old_value = getattr(admin, key)
+            if debug:
+                logger.debug("Updating field %s: %s -> %s", key, getattr(admin, key), value)
             setattr(admin, key, value)
-            updated_fields.append(f"{key}: {old_value} -> {value}")
-            logger.info(f"Updating field {key}: {old_value} -> {value}")
+            updated_count += 1
         
         admin.updatedAt = datetime.now()
-        logger.info(f"Updated {len(updated_fields)} fields: {', '.join(updated_fields)}")
         
         db.commit()
         db.refresh(admin)
-        logger.info(f"Successfully updated admin {admin_id}")
+        logger.info("Updated %s fields on admin %s", updated_count, admin_id)
         return admin
     except Exception as e:
-        logger.error(f"Error updating admin {admin_id}: {str(e)}")
-        logger.error(f"Error type: {type(e).__name__}")
-        logger.error(f"Admin data that caused error: {admin_data}")
-        logger.error(f"Exception details: {repr(e)}")
-        
-        # Handle specific database errors
-        if "DataError" in str(type(e).__name__) or "InvalidTextRepresentation" in str(e):
-            logger.error(f"Database data error - likely invalid UUID format or data type mismatch")
-            logger.error(f"Admin ID provided: {admin_id}")
-            logger.error(f"Check if admin_id is a valid UUID format")
-        
-        import traceback
-        logger.error(f"Full traceback: {traceback.format_exc()}")
+        # One record with the traceback; DataError here usually means a malformed UUID or type mismatch
+        logger.exception("Error updating admin %s with %s", admin_id, admin_data)
         db.rollback()
         return None
 
@@ -180,10 +179,13 @@ def delete_admin(admin_id: str, db: Session):
 
 def get_all_schools(db: Session):
     try:
-        # Get distinct schools from users table, excluding None and empty values
-        schools = db.query(School.name).all()
+        # Get distinct school names, excluding None and empty values, in SQL
+        schools = db.query(distinct(School.name)).filter(
+            School.name.isnot(None),
+            School.name != ''
+        ).all()
         # Extract school names from the result tuples
-        return [school[0] for school in schools if school[0]]
+        return [school[0] for school in schools]
     except Exception as e:
         db.rollback()
         return []
@@ -194,8 +196,9 @@ def update_admin_last_login(email: str, db: Session):
         admin = db.query(Admin).options(joinedload(Admin.school)).filter(Admin.email == email).first()
         if not admin:
             return None
-        admin.last_login = datetime.now()
-        admin.updatedAt = datetime.now()
+        now = datetime.now()
+        admin.last_login = now
+        admin.updatedAt = now
         db.commit()
         db.refresh(admin)
         return admin
@@ -1,8 +1,19 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, cast, Float, Date
-from database.models import ReadingHistory, User
+from sqlalchemy import func, cast, Float, Date, BigInteger, Numeric
+from database.views import reading_history_daily as rhd
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+
+# Rows are shaped in SQL (ISO date strings, integer totals, rounded hours) so the
+# response is built without per-row conversions in Python
+_DAY = func.to_char(rhd.c.day, 'YYYY-MM-DD')
+_TOTAL_DURATION = cast(func.sum(rhd.c.total_duration), BigInteger)
+_TOTAL_SESSIONS = cast(func.sum(rhd.c.sessions), BigInteger)
+
+
+def _hours(minutes):
+    return cast(func.round(cast(minutes, Numeric) / 60, 2), Float)
 
 
 def get_daily_reading_duration_analytics(db: Session, days: int = 130) -> List[Dict[str, Any]]:
@@ -21,34 +32,25 @@ def get_daily_reading_duration_analytics(db: Session, days: int = 130) -> List[D
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days-1)
         
-        # Query to get daily reading duration totals
+        # Query the daily rollup instead of grouping raw reading_history rows;
+        # it holds one row per (day, user), so counting user_id counts distinct users
         daily_stats = db.query(
-            func.date(ReadingHistory.started_at).label('date'),
-            func.sum(ReadingHistory.duration).label('total_duration'),
-            func.count(ReadingHistory.id).label('reading_sessions'),
-            func.count(func.distinct(ReadingHistory.user_id)).label('active_users')
+            _DAY.label('date'),
+            _TOTAL_DURATION.label('total_duration_minutes'),
+            _TOTAL_SESSIONS.label('reading_sessions'),
+            func.count(rhd.c.user_id).label('active_users')
         ).filter(
-            ReadingHistory.started_at >= start_date,
-            ReadingHistory.started_at <= end_date + timedelta(days=1)
+            rhd.c.day.between(start_date, end_date)
         ).group_by(
-            func.date(ReadingHistory.started_at)
+            rhd.c.day
+        ).having(
+            # Only dates with activity
+            func.sum(rhd.c.total_duration) > 0
         ).order_by(
-            func.date(ReadingHistory.started_at)
+            rhd.c.day
         ).all()
         
-        # Create a list of dates with data (only dates with activity)
-        result = []
-        
-        for stat in daily_stats:
-            if stat.total_duration and stat.total_duration > 0:
-                result.append({
-                    "date": stat.date.isoformat(),
-                    "total_duration_minutes": int(stat.total_duration),
-                    "reading_sessions": stat.reading_sessions,
-                    "active_users": stat.active_users
-                })
-        
-        return result
+        return [stat._asdict() for stat in daily_stats]
         
     except Exception as e:
         db.rollback()
@@ -72,34 +74,22 @@ def get_user_daily_reading_duration(user_id: str, db: Session, days: int = 30) -
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days-1)
         
-        # Query to get daily reading duration for specific user
+        # Query to get daily reading duration for specific user from the daily rollup
         daily_stats = db.query(
-            func.date(ReadingHistory.started_at).label('date'),
-            func.sum(ReadingHistory.duration).label('total_duration'),
-            func.count(ReadingHistory.id).label('reading_sessions')
+            _DAY.label('date'),
+            rhd.c.total_duration.label('duration_minutes'),
+            _hours(rhd.c.total_duration).label('duration_hours'),
+            rhd.c.sessions.label('reading_sessions')
         ).filter(
-            ReadingHistory.user_id == user_id,
-            ReadingHistory.started_at >= start_date,
-            ReadingHistory.started_at <= end_date + timedelta(days=1)
-        ).group_by(
-            func.date(ReadingHistory.started_at)
+            rhd.c.user_id == user_id,
+            rhd.c.day.between(start_date, end_date),
+            # Only dates with activity
+            rhd.c.total_duration > 0
         ).order_by(
-            func.date(ReadingHistory.started_at)
+            rhd.c.day
         ).all()
         
-        # Create a list of dates with data (only dates with activity)
-        result = []
-        
-        for stat in daily_stats:
-            if stat.total_duration and stat.total_duration > 0:
-                result.append({
-                    "date": stat.date.isoformat(),
-                    "duration_minutes": int(stat.total_duration),
-                    "duration_hours": round(stat.total_duration / 60, 2),
-                    "reading_sessions": stat.reading_sessions
-                })
-        
-        return result
+        return [stat._asdict() for stat in daily_stats]
         
     except Exception as e:
         db.rollback()
@@ -123,38 +113,80 @@ def get_school_daily_reading_duration(school_id: str, db: Session, days: int = 3
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days-1)
         
-        # Query to get daily reading duration for specific school
+        # Query to get daily reading duration for specific school from the daily rollup,
+        # which already carries each user's school_id
         daily_stats = db.query(
-            func.date(ReadingHistory.started_at).label('date'),
-            func.sum(ReadingHistory.duration).label('total_duration'),
-            func.count(ReadingHistory.id).label('reading_sessions'),
-            func.count(func.distinct(ReadingHistory.user_id)).label('active_users')
-        ).join(
-            User, ReadingHistory.user_id == User.id
+            _DAY.label('date'),
+            _TOTAL_DURATION.label('total_duration_minutes'),
+            _hours(func.sum(rhd.c.total_duration)).label('total_duration_hours'),
+            _TOTAL_SESSIONS.label('reading_sessions'),
+            func.count(rhd.c.user_id).label('active_users')
         ).filter(
-            User.school_id == school_id,
-            ReadingHistory.started_at >= start_date,
-            ReadingHistory.started_at <= end_date + timedelta(days=1)
+            rhd.c.school_id == school_id,
+            rhd.c.day.between(start_date, end_date)
         ).group_by(
-            func.date(ReadingHistory.started_at)
+            rhd.c.day
+        ).having(
+            # Only dates with activity
+            func.sum(rhd.c.total_duration) > 0
         ).order_by(
-            func.date(ReadingHistory.started_at)
+            rhd.c.day
         ).all()
         
-        # Create a list of dates with data (only dates with activity)
-        result = []
+        return [stat._asdict() for stat in daily_stats]
         
-        for stat in daily_stats:
-            if stat.total_duration and stat.total_duration > 0:
-                result.append({
-                    "date": stat.date.isoformat(),
-                    "total_duration_minutes": int(stat.total_duration),
-                    "total_duration_hours": round(stat.total_duration / 60, 2),
-                    "reading_sessions": stat.reading_sessions,
-                    "active_users": stat.active_users
-                })
+    except Exception as e:
+        db.rollback()
+        return None
+
+
+def get_schools_daily_reading_duration(db: Session, days: int = 30, school_ids: Optional[List[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Get daily reading duration analytics for many schools at once for the last N days
+    
+    Args:
+        db: Database session
+        days: Number of days to analyze (default: 30)
+        school_ids: Schools to include (default: every school with activity)
+    
+    Returns:
+        Dictionary mapping each school ID to the same rows as get_school_daily_reading_duration
+    """
+    try:
+        # Calculate the start date (N days ago)
+        end_date = datetime.now().date()
+        start_date = end_date - timedelta(days=days-1)
+        
+        # One grouped query for every school instead of one query per school;
+        # rows come back ordered by school, so they only need bucketing here
+        query = db.query(
+            rhd.c.school_id,
+            _DAY.label('date'),
+            _TOTAL_DURATION.label('total_duration_minutes'),
+            _hours(func.sum(rhd.c.total_duration)).label('total_duration_hours'),
+            _TOTAL_SESSIONS.label('reading_sessions'),
+            func.count(rhd.c.user_id).label('active_users')
+        ).filter(
+            rhd.c.school_id.isnot(None),
+            rhd.c.day.between(start_date, end_date)
+        )
+        if school_ids:
+            query = query.filter(rhd.c.school_id.in_(school_ids))
         
-        return result
+        daily_stats = query.group_by(
+            rhd.c.school_id, rhd.c.day
+        ).having(
+            # Only dates with activity
+            func.sum(rhd.c.total_duration) > 0
+        ).order_by(
+            rhd.c.school_id, rhd.c.day
+        ).all()
+        
+        schools = {}
+        for stat in daily_stats:
+            row = stat._asdict()
+            schools.setdefault(str(row.pop('school_id')), []).append(row)
+        return schools
         
     except Exception as e:
         db.rollback()
@@ -1,39 +1,102 @@
 import boto3
+from botocore.config import Config
+from functools import lru_cache
+import logging
 import os
 
-# S3 Client
-S3_CLIENT = boto3.client(
-    's3',
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name=os.getenv("S3_REGION")
-)
+try:
+    from amazondax import AmazonDaxClient
+except ImportError:  # amazon-dax-client is optional; tables then go straight to DynamoDB
+    AmazonDaxClient = None
+
+logger = logging.getLogger(__name__)
+
+# DAX cluster endpoint (e.g. dax://my-cluster.xxxx.dax-clusters.region.amazonaws.com)
+DAX_ENDPOINT = os.getenv("DAX_ENDPOINT")
+
 S3_REGION = os.getenv('S3_REGION')
 region = os.getenv('S3_REGION')
 
-# DynamoDB Resource
-dynamodb = boto3.resource(
-    'dynamodb',
-    region_name=os.getenv("DYNAMODB_REGION"),
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
+# Shared by every client: a larger per-client connection pool so concurrent
+# requests don't queue behind the default 10, adaptive retries and keep-alive
+AWS_CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'max_attempts': 3, 'mode': 'adaptive'},
+    tcp_keepalive=True
 )
 
-EBOOK_TAG_TABLE = dynamodb.Table('id_and_tag')
-rewards_table = dynamodb.Table('Rewards')
-quizzes_table = dynamodb.Table('quizzes')
-ebook_tag_table = dynamodb.Table('id_and_tag')
-highlights_table = dynamodb.Table('highlights')
-
-reading_history_table = dynamodb.Table('reading_history')
-ebook_table = dynamodb.Table('ebook-store')
-reading_statistics_table = dynamodb.Table('reading_statistics')
-ic_numbers_table = dynamodb.Table('IC_Numbers')
-rewards_table = dynamodb.Table('Rewards')
-
-cognito = boto3.client(
-    'cognito-idp', 
-    region_name=os.getenv("COGNITO_REGION"), 
-    aws_access_key_id=os.getenv("DYNAMODB_ACCESS_KEY_ID"), 
-    aws_secret_access_key=os.getenv("DYNAMODB_SECRET_ACCESS_KEY")
-)
\ No newline at end of file
+
+# Clients are built on first use and memoized. Call the getters where the client is
+# used, not at import time, so importing a module never opens AWS sessions
+@lru_cache(maxsize=None)
+def get_s3_client():
+    return boto3.client(
+        's3',
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        region_name=os.getenv("S3_REGION"),
+        config=AWS_CLIENT_CONFIG
+    )
+
+
+@lru_cache(maxsize=None)
+def get_dynamodb():
+    return boto3.resource(
+        'dynamodb',
+        region_name=os.getenv("DYNAMODB_REGION"),
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        config=AWS_CLIENT_CONFIG
+    )
+
+
+@lru_cache(maxsize=None)
+def get_cognito():
+    return boto3.client(
+        'cognito-idp', 
+        region_name=os.getenv("COGNITO_REGION"), 
+        aws_access_key_id=os.getenv("DYNAMODB_ACCESS_KEY_ID"), 
+        aws_secret_access_key=os.getenv("DYNAMODB_SECRET_ACCESS_KEY"),
+        config=AWS_CLIENT_CONFIG
+    )
+
+
+@lru_cache(maxsize=None)
+def get_dax():
+    """DAX resource when DAX_ENDPOINT is set and the client is installed, otherwise None"""
+    if not DAX_ENDPOINT:
+        return None
+    if AmazonDaxClient is None:
+        logger.warning("DAX_ENDPOINT is set but amazon-dax-client is not installed; using DynamoDB directly")
+        return None
+    return AmazonDaxClient.resource(
+        endpoint_url=DAX_ENDPOINT,
+        region_name=os.getenv("DYNAMODB_REGION"),
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
+    )
+
+
+# Read-heavy tables served through DAX when it's configured; DAX writes through to DynamoDB
+DAX_TABLES = {'reading_history', 'reading_statistics', 'IC_Numbers', 'Rewards', 'id_and_tag'}
+
+
+@lru_cache(maxsize=None)
+def get_table(name):
+    """DynamoDB Table for name (through DAX for DAX_TABLES when configured)"""
+    dax = get_dax() if name in DAX_TABLES else None
+    return (dax or get_dynamodb()).Table(name)
+
+
+def batch_get_items(table, key_name, keys):
+    """Fetch the items with the given keys via BatchGetItem (100 keys per call), in no particular order"""
+    items = []
+    keys = [key for key in dict.fromkeys(keys) if key]
+    for start in range(0, len(keys), 100):
+        request_items = {table.name: {'Keys': [{key_name: key} for key in keys[start:start + 100]]}}
+        while request_items:
+            response = get_dynamodb().batch_get_item(RequestItems=request_items)
+            items.extend(response.get('Responses', {}).get(table.name, []))
+            # Retry keys DynamoDB didn't get to (throttling or the 16MB response limit)
+            request_items = response.get('UnprocessedKeys')
+    return items
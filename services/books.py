@@ -1,14 +1,15 @@
+import json
 from datetime import datetime, timedelta
 from boto3.dynamodb.conditions import Key, Attr
 from datetime import datetime
-from sqlalchemy import func, cast
-from database.connection import get_db
-from database.models import ReadingHistory, ReadingStatistics, User, Books, Rewards
+from sqlalchemy import func, text, and_
+from database.models import ReadingHistory, ReadingStatistics, User, Books, Rewards, School
+from database.views import leaderboard_users, leaderboard_schools
 from sqlalchemy.orm import Session
 from sqlalchemy import Column, String, ARRAY, DateTime, ForeignKey, JSON, Integer, Float
 
 from .users import get_user_data
-from .aws_resources import reading_history_table, dynamodb, reading_statistics_table, ic_numbers_table, rewards_table
+from .aws_resources import get_table, batch_get_items
 
 def get_reading_history_by_user_ic(user_ic, page, limit, db: Session):
     # Get user_id from user_ic
@@ -37,6 +38,8 @@ def get_reading_history_by_user_ic(user_ic, page, limit, db: Session):
         Books.genres,
         Books.file_key,
         Books.status,
+        # Total for pagination, computed before OFFSET/LIMIT so it rides along with the page
+        func.count().over().label('total_count'),
     ).join(
         Books, ReadingHistory.book_id == Books.id
     ).filter(
@@ -49,10 +52,15 @@ def get_reading_history_by_user_ic(user_ic, page, limit, db: Session):
         limit
     ).all()
 
-    # Get total count for pagination
-    total_count = db.query(ReadingHistory)\
-        .filter(ReadingHistory.user_id == user.id)\
-        .count()
+    total_count = reading_history[0].total_count if reading_history else 0
+
+    # A page past the end has no rows to carry the total
+    if not reading_history and page > 1:
+        total_count = db.query(func.count(ReadingHistory.id)).join(
+            Books, ReadingHistory.book_id == Books.id
+        ).filter(
+            ReadingHistory.user_id == user.id
+        ).scalar()
 
     # Convert results to dictionaries
     history_list = []
@@ -89,7 +97,7 @@ def get_reading_history_by_user_ic(user_ic, page, limit, db: Session):
 
 def get_latest_reading_history_by_user_ic(user_ic):
     
-    response = reading_history_table.query(
+    response = get_table('reading_history').query(
         KeyConditionExpression=Key('user_ic').eq(user_ic),
         Limit=1,
         ScanIndexForward=False  # This will return items in descending order (newest first)
@@ -98,6 +106,13 @@ def get_latest_reading_history_by_user_ic(user_ic):
     items = response.get('Items', [])
     return items[0] if items else None
 
+def _parse_score(score):
+    """Scores arrive as numbers or numeric strings; anything else is stored as NULL"""
+    try:
+        return float(score)
+    except (TypeError, ValueError):
+        return None
+
 def add_reading_history(user_id, book_id, percentage, started_time, duration, score, db: Session):
     try:
         # Create new reading history record
@@ -106,172 +121,158 @@ def add_reading_history(user_id, book_id, percentage, started_time, duration, sc
             book_id=book_id,
             duration=int(duration),
             percentage=str(percentage),
-            score=str(score),
+            score=_parse_score(score),
             started_at=started_time
         )
         
-        # Add to database
+        # Add to the transaction; flushed so the aggregate below sees it
         db.add(reading_history)
-        db.commit()
+        db.flush()
         
-        # Check if user read book in last 24 hours
-        is_user_read_book_last_day = False
-        last_reading = db.query(ReadingHistory).filter(
+        # Whether another session started in the last 24 hours, and reading count/period for
+        # this book, in one pass over the user's history. The full count is needed (it feeds
+        # max_read_times_one_book), so an EXISTS probe for the first-time check would only
+        # add a second query
+        last_day = datetime.now() - timedelta(days=1)
+        book_filter = ReadingHistory.book_id == book_id
+        is_user_read_book_last_day, book_reading_count, total_reading_period = db.query(
+            func.coalesce(func.bool_or(and_(
+                ReadingHistory.id != reading_history.id,
+                ReadingHistory.started_at >= last_day
+            )), False),
+            func.count(ReadingHistory.id).filter(book_filter),
+            func.coalesce(func.sum(ReadingHistory.duration).filter(book_filter), 0)
+        ).filter(
             ReadingHistory.user_id == user_id
-        ).order_by(ReadingHistory.started_at.desc()).first()
-        
-        if last_reading:
-            current_time = datetime.now(last_reading.started_at.tzinfo)
-            last_day = current_time - timedelta(days=1)
-            if last_reading.started_at >= last_day:
-                is_user_read_book_last_day = True
+        ).one()
         
         # Check if this is first time reading this book
-        book_reading_count = db.query(ReadingHistory).filter(
-            ReadingHistory.user_id == user_id,
-            ReadingHistory.book_id == book_id
-        ).count()
-        
         is_first_time = book_reading_count == 1
         
         if is_first_time:
-            update_reading_statistics(user_id, book_id, percentage, started_time, duration, is_user_read_book_last_day, is_first_time)
+            update_reading_statistics(user_id, book_id, percentage, started_time, duration, is_user_read_book_last_day, is_first_time, db=db)
         else:
-            # Calculate total reading times and period for this book
-            total_reading_times = book_reading_count
-            total_reading_period = db.query(func.sum(ReadingHistory.duration)).filter(
-                ReadingHistory.user_id == user_id,
-                ReadingHistory.book_id == book_id
-            ).scalar() or 0
-            
-            update_reading_statistics(user_id, book_id, percentage, started_time, duration, is_user_read_book_last_day, is_first_time, total_reading_period, total_reading_times)
+            update_reading_statistics(user_id, book_id, percentage, started_time, duration, is_user_read_book_last_day, is_first_time, total_reading_period, book_reading_count, db=db)
+        
+        # History, statistics and rewards are committed together
+        db.commit()
             
     except Exception as e:
         db.rollback()
         raise e
-    finally:
-        db.close()
 
 def get_reading_statistics_by_user_ic(user_ic):
-    response = reading_statistics_table.get_item(Key={'user_ic': user_ic})
+    response = get_table('reading_statistics').get_item(Key={'user_ic': user_ic})
     return response.get('Item', {})
 
-def update_reading_statistics(user_id, book_id, percent, started_time, duration, is_user_read_book_last_day, is_first_time, total_reading_period=0, total_reading_times=0):
-    db = next(get_db())
-    try:
-        # Get existing statistics or create new
-        stats = db.query(ReadingStatistics).filter(ReadingStatistics.user_id == user_id).first()
-        
-        if stats:
-            # Update existing statistics
-            stats.total_read_books += 1
-            stats.total_read_period += int(duration)
-            stats.longest_continuous_read_period += (1 if is_user_read_book_last_day else 0)
-            
-            # Update longest read period for one book
-            if total_reading_period > stats.longest_read_period_one_book:
-                stats.longest_read_period_one_book = total_reading_period
-                stats.longest_read_period_one_book_id = book_id
-            
-            # Update max read times for one book
-            if total_reading_times > stats.max_read_times_one_book:
-                stats.max_read_times_one_book = total_reading_times
-                stats.max_read_times_one_book_id = book_id
-        else:
-            # Create new statistics
-            stats = ReadingStatistics(
-                user_id=user_id,
-                total_read_books=1,
-                total_read_period=int(duration),
-                longest_continuous_read_period=1,
-                longest_read_period_one_book=total_reading_period,
-                longest_read_period_one_book_id=book_id,
-                max_read_times_one_book=total_reading_times,
-                max_read_times_one_book_id=book_id
-            )
-            db.add(stats)
-        
-        db.commit()
+def update_reading_statistics(user_id, book_id, percent, started_time, duration, is_user_read_book_last_day, is_first_time, total_reading_period=0, total_reading_times=0, *, db: Session):
+    """Update the user's reading statistics in the caller's transaction; the caller commits"""
+    # Get existing statistics or create new
+    stats = db.query(ReadingStatistics).filter(ReadingStatistics.user_id == user_id).first()
+    
+    if stats:
+        # Update existing statistics
+        stats.total_read_books += 1
+        stats.total_read_period += int(duration)
+        stats.longest_continuous_read_period += (1 if is_user_read_book_last_day else 0)
         
-        # Check for rewards
-        check_user_reward(str(user_id), {
-            'total_read_books': stats.total_read_books,
-            'total_read_period': stats.total_read_period,
-            'longest_continuous_read_period': stats.longest_continuous_read_period,
-            'longest_read_period_one_book': stats.longest_read_period_one_book,
-            'max_read_times_one_book': stats.max_read_times_one_book
-        })
+        # Update longest read period for one book
+        if total_reading_period > stats.longest_read_period_one_book:
+            stats.longest_read_period_one_book = total_reading_period
+            stats.longest_read_period_one_book_id = book_id
         
-    except Exception as e:
-        db.rollback()
-        raise e
-    finally:
-        db.close()
+        # Update max read times for one book
+        if total_reading_times > stats.max_read_times_one_book:
+            stats.max_read_times_one_book = total_reading_times
+            stats.max_read_times_one_book_id = book_id
+    else:
+        # Create new statistics
+        stats = ReadingStatistics(
+            user_id=user_id,
+            total_read_books=1,
+            total_read_period=int(duration),
+            longest_continuous_read_period=1,
+            longest_read_period_one_book=total_reading_period,
+            longest_read_period_one_book_id=book_id,
+            max_read_times_one_book=total_reading_times,
+            max_read_times_one_book_id=book_id
+        )
+        db.add(stats)
 
-def check_user_reward(user_id, updated_item):
-    db = next(get_db())
-    try:
-        # Get user's unclaimed rewards
-        user = db.query(User).filter(user_id == user_id).first()
-        if not user:
-            return
-            
-        # Get all rewards
-        rewards = db.query(Rewards).all()
-        
-        for reward in rewards:
-            is_matched = True
-            for condition in reward.condition:
-                field = condition.get('field', '')
-                limit = condition.get('limit', 0)
-                if float(updated_item.get(field, 0)) < limit:
-                    is_matched = False
-                    break
-                    
-            if is_matched and reward.id not in user.rewards:
-                # Add reward to user's rewards
-                if not user.rewards:
-                    user.rewards = []
-                user.rewards.append(str(reward.id))
-                db.commit()
-                
-    except Exception as e:
-        db.rollback()
-        raise e
-    finally:
-        db.close()
+    # Check for rewards
+    check_user_reward(str(user_id), {
+        'total_read_books': stats.total_read_books,
+        'total_read_period': stats.total_read_period,
+        'longest_continuous_read_period': stats.longest_continuous_read_period,
+        'longest_read_period_one_book': stats.longest_read_period_one_book,
+        'max_read_times_one_book': stats.max_read_times_one_book
+    }, db)
+
+# Ids of rewards whose every {field, limit} condition is met by :stats and that
+# aren't in :user_rewards yet; a missing stat counts as 0, like the old Python check
+_MATCHING_REWARDS_SQL = text("""
+    SELECT r.id::text
+    FROM rewards r
+    WHERE jsonb_typeof(CAST(r.condition AS jsonb)) = 'array'
+      AND NOT EXISTS (
+          SELECT 1
+          FROM jsonb_array_elements(CAST(r.condition AS jsonb)) c
+          WHERE COALESCE((CAST(:stats AS jsonb) ->> (c ->> 'field'))::float, 0)
+                < COALESCE((c ->> 'limit')::float, 0)
+      )
+      AND NOT (r.id::text = ANY(CAST(:user_rewards AS varchar[])))
+""")
+
+_APPEND_REWARDS_SQL = text("""
+    UPDATE users
+    SET rewards = COALESCE(rewards, '{}') || CAST(:reward_ids AS varchar[])
+    WHERE id = :user_id
+""")
+
+def check_user_reward(user_id, updated_item, db: Session):
+    """Grant every reward the stats now qualify for, in the caller's transaction"""
+    # Get the rewards the user already has (primary key lookup)
+    user_rewards = db.query(User.rewards).filter(User.id == user_id).first()
+    if not user_rewards:
+        return
+
+    # Match every reward in one query instead of looping over them in Python
+    reward_ids = db.execute(_MATCHING_REWARDS_SQL, {
+        'stats': json.dumps(updated_item, default=str),
+        'user_rewards': list(user_rewards.rewards or []),
+    }).scalars().all()
+
+    if reward_ids:
+        # Add rewards to user's rewards
+        db.execute(_APPEND_REWARDS_SQL, {'reward_ids': reward_ids, 'user_id': user_id})
 
 def get_user_reward(user_ic):
-    response = ic_numbers_table.get_item(Key={'icNumber': user_ic})
+    response = get_table('IC_Numbers').get_item(Key={'icNumber': user_ic})
     user = response.get('Item', {})
     return user.get('rewards', [])
 
 def get_unclaimed_rewards(user_rewards):
-    response = rewards_table.scan(FilterExpression=Attr('rewardId').is_in(user_rewards)
-)
-    return response.get('Items', [])
+    # Fetch the rewards by key instead of scanning the table
+    return batch_get_items(get_table('Rewards'), 'rewardId', user_rewards)
 
 def add_user_reward(user_ic, reward_id):
-    ic_numbers_table.update_item(
+    get_table('IC_Numbers').update_item(
         Key={'icNumber': user_ic},
         UpdateExpression='SET rewards = list_append(if_not_exists(rewards, :empty_list), :reward_id)',
         ExpressionAttributeValues={':empty_list': [], ':reward_id': [reward_id]}  # Wrap reward_id in a list
     )
 
 def get_top_readers(db: Session, group='student', limit=3):
+    # Leaderboards read the precomputed leaderboard_* views (see database/views.py)
     if group == 'school':
         # Get top schools based on total_read_books
         top_schools = db.query(
-            School.name,
-            func.sum(ReadingStatistics.total_read_books).label('total_books')
-        ).join(
-            User, School.id == User.school_id
-        ).join(
-            ReadingStatistics, User.id == ReadingStatistics.user_id
-        ).group_by(
-            School.name
+            leaderboard_schools.c.school_name,
+            leaderboard_schools.c.total_read_books
+        ).filter(
+            leaderboard_schools.c.total_read_books.isnot(None)
         ).order_by(
-            func.sum(ReadingStatistics.total_read_books).desc()
+            leaderboard_schools.c.total_read_books.desc()
         ).limit(limit).all()
         
         # Format the results
@@ -284,32 +285,32 @@ def get_top_readers(db: Session, group='student', limit=3):
             result.append(school_data)
         return result
     
-    # Get top 3 readers based on total_read_books
+    # Get top 3 readers based on total_read_books, selecting only the columns we return
     top_readers = db.query(
-        ReadingStatistics,
-        User.ic_number,
-        User.name,
-        User.avatar_url,
-        School.name.label('school_name')
-    ).join(
-        User, ReadingStatistics.user_id == User.id
-    ).outerjoin(
-        School, User.school_id == School.id
+        leaderboard_users.c.total_read_books,
+        leaderboard_users.c.total_read_period,
+        leaderboard_users.c.longest_continuous_read_period,
+        leaderboard_users.c.ic_number,
+        leaderboard_users.c.name,
+        leaderboard_users.c.avatar_url,
+        leaderboard_users.c.school_name
+    ).filter(
+        leaderboard_users.c.total_read_books.isnot(None)
     ).order_by(
-        ReadingStatistics.total_read_books.desc()
+        leaderboard_users.c.total_read_books.desc()
     ).limit(limit).all()
     
     # Format the results
     result = []
-    for stats, ic_number, name, avatar_url, school in top_readers:
+    for row in top_readers:
         reader = {
-            'user_ic': ic_number,
-            'name': name,
-            'avatar_url': avatar_url,
-            'school': school,
-            'value': stats.total_read_books,
-            'total_read_period': stats.total_read_period,
-            'longest_continuous_read_period': stats.longest_continuous_read_period
+            'user_ic': row.ic_number,
+            'name': row.name,
+            'avatar_url': row.avatar_url,
+            'school': row.school_name,
+            'value': row.total_read_books,
+            'total_read_period': row.total_read_period,
+            'longest_continuous_read_period': row.longest_continuous_read_period
         }
         result.append(reader)
     return result
@@ -318,16 +319,12 @@ def get_top_reading_time(db: Session, group='student', limit=3):
     if group == 'school':
         # Get top schools based on total_read_period
         top_schools = db.query(
-            School.name,
-            func.sum(ReadingStatistics.total_read_period).label('read_time')
-        ).join(
-            User, School.id == User.school_id
-        ).join(
-            ReadingStatistics, User.id == ReadingStatistics.user_id
-        ).group_by(
-            School.name
+            leaderboard_schools.c.school_name,
+            leaderboard_schools.c.total_read_period
+        ).filter(
+            leaderboard_schools.c.total_read_period.isnot(None)
         ).order_by(
-            func.sum(ReadingStatistics.total_read_period).desc()
+            leaderboard_schools.c.total_read_period.desc()
         ).limit(limit).all()
         
         # Format the results
@@ -340,32 +337,32 @@ def get_top_reading_time(db: Session, group='student', limit=3):
             result.append(school_data)
         return result
 
-    # Get top readers based on total_read_period
+    # Get top readers based on total_read_period, selecting only the columns we return
     top_readers = db.query(
-        ReadingStatistics,
-        User.ic_number,
-        User.name,
-        User.avatar_url,
-        School.name.label('school_name')
-    ).join(
-        User, ReadingStatistics.user_id == User.id
-    ).outerjoin(
-        School, User.school_id == School.id
+        leaderboard_users.c.total_read_books,
+        leaderboard_users.c.total_read_period,
+        leaderboard_users.c.longest_continuous_read_period,
+        leaderboard_users.c.ic_number,
+        leaderboard_users.c.name,
+        leaderboard_users.c.avatar_url,
+        leaderboard_users.c.school_name
+    ).filter(
+        leaderboard_users.c.total_read_period.isnot(None)
     ).order_by(
-        ReadingStatistics.total_read_period.desc()
+        leaderboard_users.c.total_read_period.desc()
     ).limit(limit).all()
     
     # Format the results
     result = []
-    for stats, ic_number, name, avatar_url, school in top_readers:
+    for row in top_readers:
         reader = {
-            'user_ic': ic_number,
-            'name': name,
-            'avatar_url': avatar_url,
-            'school': school,
-            'total_read_books': stats.total_read_books,
-            'value': stats.total_read_period,
-            'longest_continuous_read_period': stats.longest_continuous_read_period
+            'user_ic': row.ic_number,
+            'name': row.name,
+            'avatar_url': row.avatar_url,
+            'school': row.school_name,
+            'total_read_books': row.total_read_books,
+            'value': row.total_read_period,
+            'longest_continuous_read_period': row.longest_continuous_read_period
         }
         result.append(reader)
     return result
@@ -374,16 +371,12 @@ def get_top_quiz_scores(db: Session, group='student', limit=3):
     if group == 'school':
         # Get top schools based on sum of quiz scores
         top_schools = db.query(
-            School.name,
-            func.sum(cast(ReadingHistory.score, Float)).label('quiz_scores')
-        ).join(
-            User, School.id == User.school_id
-        ).join(
-            ReadingHistory, User.id == ReadingHistory.user_id
-        ).group_by(
-            School.name
+            leaderboard_schools.c.school_name,
+            leaderboard_schools.c.total_quiz_score
+        ).filter(
+            leaderboard_schools.c.total_quiz_score.isnot(None)
         ).order_by(
-            func.sum(cast(ReadingHistory.score, Float)).desc()
+            leaderboard_schools.c.total_quiz_score.desc()
         ).limit(limit).all()
         
         # Format the results
@@ -391,26 +384,22 @@ def get_top_quiz_scores(db: Session, group='student', limit=3):
         for school, quiz_scores in top_schools:
             school_data = {
                 'name': school,
-                'value': float(quiz_scores) if quiz_scores else 0
+                'value': quiz_scores or 0
             }
             result.append(school_data)
         return result
 
     # Get top users based on sum of quiz scores
     top_scores = db.query(
-        User.ic_number,
-        User.name,
-        User.avatar_url,
-        School.name.label('school_name'),
-        func.sum(cast(ReadingHistory.score, Float)).label('total_score')
-    ).join(
-        ReadingHistory, User.id == ReadingHistory.user_id
-    ).outerjoin(
-        School, User.school_id == School.id
-    ).group_by(
-        User.id, User.ic_number, User.name, User.avatar_url, School.name
+        leaderboard_users.c.ic_number,
+        leaderboard_users.c.name,
+        leaderboard_users.c.avatar_url,
+        leaderboard_users.c.school_name,
+        leaderboard_users.c.total_quiz_score
+    ).filter(
+        leaderboard_users.c.total_quiz_score.isnot(None)
     ).order_by(
-        func.sum(cast(ReadingHistory.score, Float)).desc()
+        leaderboard_users.c.total_quiz_score.desc()
     ).limit(limit).all()
     
     # Format the results
@@ -421,7 +410,7 @@ def get_top_quiz_scores(db: Session, group='student', limit=3):
             'name': name,
             'avatar_url': avatar_url,
             'school': school,
-            'value': float(total_score) if total_score else 0
+            'value': total_score or 0
         }
         result.append(scorer)
     return result
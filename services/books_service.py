@@ -1,28 +1,88 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, distinct
+from sqlalchemy import func, distinct, tuple_
 from database.models import Books
+from services.cache import cache_get, cache_set, cache_delete_prefix
 import uuid
 from datetime import datetime
 from typing import List, Optional
 
 
-def get_all_books(db: Session, page: int = 1, limit: int = 20, status: Optional[str] = None):
-    """Get all books with optional pagination and status filtering"""
+# Columns rendered by books_controller.serialize_book. List endpoints load them as
+# plain rows, skipping ORM instance construction and identity-map bookkeeping
+BOOK_LIST_COLUMNS = (
+    Books.id,
+    Books.title,
+    Books.file_key,
+    Books.url,
+    Books.thumb_url,
+    Books.thumbnail,
+    Books.assistant_id,
+    Books.file_id,
+    Books.vector_store_id,
+    Books.language,
+    Books.genres,
+    Books.author,
+    Books.pages,
+    Books.status,
+    Books.created_at,
+    Books.updated_at,
+)
+
+# Dashboard polls the status breakdown; it is served from cache and dropped on every book write
+BOOKS_ANALYTICS_CACHE_KEY = "books:analytics"
+BOOKS_ANALYTICS_TTL = 60  # seconds
+
+
+def invalidate_books_analytics():
+    """Drop the cached books analytics after the books table changes"""
+    cache_delete_prefix(BOOKS_ANALYTICS_CACHE_KEY)
+
+
+def _encode_book_cursor(book) -> Optional[str]:
+    """Opaque keyset cursor for the row after which the next page starts"""
+    if book.created_at is None:
+        return None
+    return f"{book.created_at.isoformat()}|{book.id}"
+
+
+def decode_book_cursor(cursor: str):
+    """(created_at, id) of the row a next_cursor points at; raises ValueError if it is malformed"""
+    created_at, sep, book_id = cursor.rpartition("|")
+    if not sep:
+        raise ValueError(f"Invalid book cursor: {cursor!r}")
+    return datetime.fromisoformat(created_at), uuid.UUID(book_id)
+
+
+def get_all_books(db: Session, page: int = 1, limit: int = 20, status: Optional[str] = None, after: Optional[tuple] = None):
+    """Get all books, newest first, with optional status filtering.
+
+    Pass the previous response's next_cursor, decoded with decode_book_cursor, as
+    after to page by keyset (cost independent of depth); without it the page
+    number is used as an offset.
+    """
     try:
-        query = db.query(Books)
+        query = db.query(*BOOK_LIST_COLUMNS)
         
         if status:
             query = query.filter(Books.status == status)
         
         total_count = query.count()
         
-        books = query.offset((page - 1) * limit).limit(limit).all()
+        query = query.order_by(Books.created_at.desc().nulls_last(), Books.id.desc())
+        if after:
+            last_created_at, last_id = after
+            query = query.filter(tuple_(Books.created_at, Books.id) < tuple_(last_created_at, last_id))
+        else:
+            query = query.offset((page - 1) * limit)
+        
+        books = query.limit(limit).all()
         
         return {
             "books": books,
             "total_count": total_count,
             "page": page,
-            "limit": limit
+            "limit": limit,
+            "next_cursor": _encode_book_cursor(books[-1]) if len(books) == limit else None
         }
     except Exception as e:
         db.rollback()
@@ -62,6 +122,7 @@ def add_book(book_data: dict, db: Session):
         db.add(new_book)
         db.commit()
         db.refresh(new_book)
+        invalidate_books_analytics()
         return new_book
     except Exception as e:
         db.rollback()
@@ -83,6 +144,7 @@ def update_book(book_id: str, book_data: dict, db: Session):
         book.updated_at = datetime.now()
         db.commit()
         db.refresh(book)
+        invalidate_books_analytics()
         return book
     except Exception as e:
         db.rollback()
@@ -97,6 +159,7 @@ def delete_book(book_id: str, db: Session):
             return None
         db.delete(book)
         db.commit()
+        invalidate_books_analytics()
         return True
     except Exception as e:
         db.rollback()
@@ -106,15 +169,15 @@ def delete_book(book_id: str, db: Session):
 def delete_bulk_books(book_ids: List[str], db: Session):
     """Delete multiple books by their IDs"""
     try:
-        books = db.query(Books).filter(Books.id.in_(book_ids)).all()
-        if not books:
+        # One DELETE ... WHERE id IN (...) instead of loading and deleting row by row
+        deleted = db.query(Books).filter(Books.id.in_(book_ids)).delete(synchronize_session=False)
+        if not deleted:
+            db.rollback()
             return None
         
-        for book in books:
-            db.delete(book)
-        
         db.commit()
-        return len(books)
+        invalidate_books_analytics()
+        return deleted
     except Exception as e:
         db.rollback()
         return None
@@ -122,25 +185,29 @@ def delete_bulk_books(book_ids: List[str], db: Session):
 
 def get_books_analytics(db: Session):
     """Get books analytics including total count and count by status"""
+    cached = cache_get(BOOKS_ANALYTICS_CACHE_KEY)
+    if cached is not None:
+        return cached
+
     try:
-        # Get total books count
-        total_books = db.query(Books).count()
-        
         # Get books count by status
         status_counts = db.query(
             Books.status,
             func.count(Books.id).label('count')
         ).group_by(Books.status).all()
         
-        # Convert to dictionary format
+        # Convert to dictionary format; the total is the sum of the groups
         status_analytics = {}
         for status, count in status_counts:
             status_analytics[status] = count
+        total_books = sum(status_analytics.values())
         
-        return {
+        analytics = {
             "total_books": total_books,
             "books_by_status": status_analytics
         }
+        cache_set(BOOKS_ANALYTICS_CACHE_KEY, analytics, BOOKS_ANALYTICS_TTL)
+        return analytics
     except Exception as e:
         db.rollback()
         return None
@@ -149,7 +216,7 @@ def get_books_analytics(db: Session):
 def get_books_by_status(status: str, db: Session, page: int = 1, limit: int = 20):
     """Get books filtered by status"""
     try:
-        query = db.query(Books).filter(Books.status == status)
+        query = db.query(*BOOK_LIST_COLUMNS).filter(Books.status == status)
         total_count = query.count()
         books = query.offset((page - 1) * limit).limit(limit).all()
         
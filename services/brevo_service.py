@@ -1,11 +1,91 @@
+import asyncio
+import httpx
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
 import logging
+import os
 from typing import List, Optional, Dict, Any
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
 from config import settings
 
 logger = logging.getLogger(__name__)
 
+# Templates are compiled once per process and each send only renders them; the
+# bytecode cache (a per-user temp directory) lets new workers skip compiling too.
+# HTML templates autoescape; `message` is passed through as HTML on purpose
+_JINJA_ENV = Environment(
+    loader=FileSystemLoader(os.path.join(os.path.dirname(__file__), "email_templates")),
+    bytecode_cache=FileSystemBytecodeCache(),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
+    cache_size=-1,
+)
+_TEMPLATES = {
+    name: _JINJA_ENV.get_template(name)
+    for name in (
+        "password_reset.html", "password_reset.txt",
+        "welcome.html", "welcome.txt",
+        "notification.html", "notification.txt",
+        "bulk.html", "bulk.txt",
+    )
+}
+
+
+def _render_email(name: str, **context) -> tuple:
+    """Render the (text, html) bodies of the named email template"""
+    context.setdefault("from_name", settings.FROM_NAME)
+    return _TEMPLATES[f"{name}.txt"].render(**context), _TEMPLATES[f"{name}.html"].render(**context)
+
+
+BREVO_EMAIL_URL = "https://api.brevo.com/v3/smtp/email"
+BREVO_MAX_MESSAGE_VERSIONS = 1000  # recipients Brevo accepts in one messageVersions request
+BULK_EMAIL_CONCURRENCY = 20  # messageVersions requests in flight at once
+
+_BREVO_HEADERS = {
+    "accept": "application/json",
+    # httpx rejects None header values, so an unset key is sent empty (Brevo answers 401)
+    "api-key": settings.BREVO_API_KEY or "",
+    "content-type": "application/json",
+}
+
+# One pooled session so sends reuse a kept-alive TLS connection to Brevo. Only
+# connection failures and 429s are retried: a POST that reached Brevo may have been
+# delivered, so read errors and 5xx are not replayed
+_SESSION = requests.Session()
+_SESSION.headers.update(_BREVO_HEADERS)
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=50,
+    max_retries=Retry(
+        total=3,
+        read=0,
+        backoff_factor=0.3,
+        status_forcelist=[429],
+        allowed_methods=frozenset({"POST"}),
+        raise_on_status=False,
+    ),
+))
+
+# Pooled async client for BrevoEmailService, so sends don't block the event loop;
+# concurrent sends multiplex over HTTP/2. The transport only retries failed
+# connection attempts, for the same reason. Closed by close_async_client()
+_ASYNC_CLIENT = httpx.AsyncClient(
+    headers=_BREVO_HEADERS,
+    timeout=30,
+    transport=httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=3,
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=50),
+    ),
+)
+
+
+async def close_async_client():
+    """Close the pooled Brevo connections (called on app shutdown)"""
+    await _ASYNC_CLIENT.aclose()
+
 
 def send_email_brevo(to_email: str, subject: str, text_content: str, html_content: str = None):
     """
@@ -20,8 +100,6 @@ def send_email_brevo(to_email: str, subject: str, text_content: str, html_conten
     Returns:
         bool: True if email is sent successfully, False otherwise
     """
-    url = "https://api.brevo.com/v3/smtp/email"
-    
     # Prepare the payload
     payload = {
         "sender": {"name": settings.FROM_NAME, "email": settings.EMAIL_FROM},
@@ -34,14 +112,9 @@ def send_email_brevo(to_email: str, subject: str, text_content: str, html_conten
     if html_content:
         payload["htmlContent"] = html_content
     
-    headers = {
-        "accept": "application/json",
-        "api-key": settings.BREVO_API_KEY,
-        "content-type": "application/json",
-    }
-    
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
+        # orjson encodes the multi-kilobyte HTML bodies in C; the session already sends the JSON content-type
+        response = _SESSION.post(BREVO_EMAIL_URL, data=orjson.dumps(payload), timeout=30)
         
         if response.status_code == 201:
             logger.info(f"Email sent successfully to {to_email}")
@@ -58,270 +131,102 @@ def send_email_brevo(to_email: str, subject: str, text_content: str, html_conten
         return False
 
 
-class BrevoEmailService:
-    """Enhanced email service using Brevo API"""
-    
-    @staticmethod
-    async def send_password_reset_email(email: str, reset_token: str, user_name: str = None) -> bool:
-        """Send password reset email with enhanced formatting"""
-        try:
-            subject = "Password Reset Request"
+async def _post_email_async(payload: Dict[str, Any], recipients: str) -> bool:
+    """POST a prepared payload to Brevo and log the outcome for the given recipients"""
+    try:
+        response = await _ASYNC_CLIENT.post(BREVO_EMAIL_URL, content=orjson.dumps(payload))
+        
+        if response.status_code == 201:
+            logger.info(f"Email sent successfully to {recipients}")
+            return True
+        else:
+            logger.error(f"Failed to send email to {recipients}. Status: {response.status_code}, Response: {response.text}")
+            return False
             
-            # Plain text version
-            text_content = f"""
-Hello{user_name if user_name else ""},
+    except httpx.HTTPError as e:
+        logger.error(f"Request failed for {recipients}. Error: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"Failed to send email to {recipients}. Error: {e}")
+        return False
+
+
+async def send_email_brevo_async(to_email: str, subject: str, text_content: str, html_content: str = None) -> bool:
+    """Async version of send_email_brevo, for use from coroutines"""
+    payload = {
+        "sender": {"name": settings.FROM_NAME, "email": settings.EMAIL_FROM},
+        "to": [{"email": to_email}],
+        "subject": subject,
+        "textContent": text_content,
+    }
+    if html_content:
+        payload["htmlContent"] = html_content
+    
+    return await _post_email_async(payload, to_email)
+
+
+async def send_batch_email_brevo(to_emails: List[str], subject: str, text_content: str, html_content: str = None) -> bool:
+    """
+    Send the same email to many recipients in one Brevo API call.
+    Each recipient gets their own message (messageVersions), so nobody sees the others.
+     
+    Args:
+        to_emails: Recipient email addresses (at most BREVO_MAX_MESSAGE_VERSIONS)
+        subject: The subject of the email
+        text_content: The plain text content of the email
+        html_content: The HTML content of the email (optional)
+     
+    Returns:
+        bool: True if Brevo accepted the batch, False otherwise
+    """
+    payload = {
+        "sender": {"name": settings.FROM_NAME, "email": settings.EMAIL_FROM},
+        "subject": subject,
+        "textContent": text_content,
+        "messageVersions": [{"to": [{"email": email}]} for email in to_emails],
+    }
+    if html_content:
+        payload["htmlContent"] = html_content
+    
+    return await _post_email_async(payload, f"{len(to_emails)} recipients")
 
-You have requested to reset your password. Please use the following token to reset your password:
 
-{reset_token}
+# Subjects of the templated emails that don't take one from the caller
+_EMAIL_SUBJECTS = {
+    "password_reset": "Password Reset Request",
+    "welcome": "Welcome to Our Platform!",
+}
 
-Important: This token will expire in 1 hour for security reasons.
 
-Security Notice: If you did not request this password reset, please ignore this email and contact support immediately.
+async def _send_templated_email(name: str, email: str, subject: str = None, **context) -> bool:
+    """Render the named email template for one recipient and send it; failures are logged, not raised"""
+    if subject is None:
+        subject = _EMAIL_SUBJECTS[name]
+    try:
+        text_content, html_content = _render_email(name, subject=subject, **context)
+        return await send_email_brevo_async(email, subject, text_content, html_content)
+    except Exception as e:
+        logger.error(f"Failed to send {name.replace('_', ' ')} email to {email}: {e}")
+        return False
 
-Best regards,
-{settings.FROM_NAME}
 
-This is an automated message. Please do not reply to this email.
-            """
-            
-            # HTML version of the email
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="utf-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <title>Password Reset</title>
-                <style>
-                    body {{
-                        font-family: Arial, sans-serif;
-                        line-height: 1.6;
-                        color: #333;
-                        max-width: 600px;
-                        margin: 0 auto;
-                        padding: 20px;
-                    }}
-                    .header {{
-                        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                        color: white;
-                        padding: 30px;
-                        text-align: center;
-                        border-radius: 10px 10px 0 0;
-                    }}
-                    .content {{
-                        background: #f9f9f9;
-                        padding: 30px;
-                        border-radius: 0 0 10px 10px;
-                    }}
-                    .token-box {{
-                        background: #fff;
-                        border: 2px solid #667eea;
-                        border-radius: 8px;
-                        padding: 20px;
-                        margin: 20px 0;
-                        text-align: center;
-                        font-family: 'Courier New', monospace;
-                        font-size: 18px;
-                        font-weight: bold;
-                        color: #667eea;
-                    }}
-                    .warning {{
-                        background: #fff3cd;
-                        border: 1px solid #ffeaa7;
-                        border-radius: 5px;
-                        padding: 15px;
-                        margin: 20px 0;
-                        color: #856404;
-                    }}
-                    .footer {{
-                        text-align: center;
-                        margin-top: 30px;
-                        padding-top: 20px;
-                        border-top: 1px solid #ddd;
-                        color: #666;
-                        font-size: 14px;
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="header">
-                    <h1>🔐 Password Reset Request</h1>
-                </div>
-                <div class="content">
-                    <p>Hello{f" {user_name}" if user_name else ""},</p>
-                    
-                    <p>You have requested to reset your password. Please use the following token to reset your password:</p>
-                    
-                    <div class="token-box">
-                        {reset_token}
-                    </div>
-                    
-                    <p><strong>Important:</strong> This token will expire in 1 hour for security reasons.</p>
-                    
-                    <div class="warning">
-                        <strong>⚠️ Security Notice:</strong> If you did not request this password reset, please ignore this email and contact support immediately.
-                    </div>
-                    
-                    <p>Best regards,<br>
-                    <strong>{settings.FROM_NAME}</strong></p>
-                </div>
-                <div class="footer">
-                    <p>This is an automated message. Please do not reply to this email.</p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            return send_email_brevo(email, subject, text_content, html_content)
-            
-        except Exception as e:
-            logger.error(f"Failed to send password reset email to {email}: {e}")
-            return False
+class BrevoEmailService:
+    """Enhanced email service using Brevo API"""
+    
+    @staticmethod
+    async def send_password_reset_email(email: str, reset_token: str, user_name: str = None) -> bool:
+        """Send password reset email with enhanced formatting"""
+        return await _send_templated_email("password_reset", email, user_name=user_name, reset_token=reset_token)
     
     @staticmethod
     async def send_welcome_email(email: str, user_name: str) -> bool:
         """Send welcome email to new users"""
-        try:
-            subject = "Welcome to Our Platform!"
-            
-            # Plain text version
-            text_content = f"""
-Hello {user_name},
-
-Welcome to our platform! We're excited to have you on board.
-
-Your account has been successfully created and is now active. You can start using all the features available to you.
-
-If you have any questions or need assistance, please don't hesitate to contact our support team.
-
-Best regards,
-{settings.FROM_NAME}
-            """
-            
-            # HTML version
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="utf-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <title>Welcome!</title>
-                <style>
-                    body {{
-                        font-family: Arial, sans-serif;
-                        line-height: 1.6;
-                        color: #333;
-                        max-width: 600px;
-                        margin: 0 auto;
-                        padding: 20px;
-                    }}
-                    .header {{
-                        background: linear-gradient(135deg, #4CAF50 0%, #45a049 100%);
-                        color: white;
-                        padding: 30px;
-                        text-align: center;
-                        border-radius: 10px 10px 0 0;
-                    }}
-                    .content {{
-                        background: #f9f9f9;
-                        padding: 30px;
-                        border-radius: 0 0 10px 10px;
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="header">
-                    <h1>🎉 Welcome to Our Platform!</h1>
-                </div>
-                <div class="content">
-                    <p>Hello {user_name},</p>
-                    
-                    <p>Welcome to our platform! We're excited to have you on board.</p>
-                    
-                    <p>Your account has been successfully created and is now active. You can start using all the features available to you.</p>
-                    
-                    <p>If you have any questions or need assistance, please don't hesitate to contact our support team.</p>
-                    
-                    <p>Best regards,<br>
-                    <strong>{settings.FROM_NAME}</strong></p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            return send_email_brevo(email, subject, text_content, html_content)
-            
-        except Exception as e:
-            logger.error(f"Failed to send welcome email to {email}: {e}")
-            return False
+        return await _send_templated_email("welcome", email, user_name=user_name)
     
     @staticmethod
     async def send_notification_email(email: str, subject: str, message: str, user_name: str = None) -> bool:
         """Send general notification email"""
-        try:
-            # Plain text version
-            text_content = f"""
-Hello{user_name if user_name else ""},
-
-{message}
-
-Best regards,
-{settings.FROM_NAME}
-            """
-            
-            # HTML version
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="utf-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <title>{subject}</title>
-                <style>
-                    body {{
-                        font-family: Arial, sans-serif;
-                        line-height: 1.6;
-                        color: #333;
-                        max-width: 600px;
-                        margin: 0 auto;
-                        padding: 20px;
-                    }}
-                    .header {{
-                        background: linear-gradient(135deg, #2196F3 0%, #1976D2 100%);
-                        color: white;
-                        padding: 30px;
-                        text-align: center;
-                        border-radius: 10px 10px 0 0;
-                    }}
-                    .content {{
-                        background: #f9f9f9;
-                        padding: 30px;
-                        border-radius: 0 0 10px 10px;
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="header">
-                    <h1>{subject}</h1>
-                </div>
-                <div class="content">
-                    <p>Hello{f" {user_name}" if user_name else ""},</p>
-                    
-                    {message}
-                    
-                    <p>Best regards,<br>
-                    <strong>{settings.FROM_NAME}</strong></p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            return send_email_brevo(email, subject, text_content, html_content)
-            
-        except Exception as e:
-            logger.error(f"Failed to send notification email to {email}: {e}")
-            return False
+        return await _send_templated_email("notification", email, subject, message=message, user_name=user_name)
     
     @staticmethod
     async def send_bulk_email(emails: List[str], subject: str, message: str) -> Dict[str, Any]:
@@ -331,69 +236,24 @@ Best regards,
             "failed": []
         }
         
-        for email in emails:
-            try:
-                # Plain text version
-                text_content = f"""
-{message}
-
-Best regards,
-{settings.FROM_NAME}
-                """
-                
-                # HTML version
-                html_content = f"""
-                <!DOCTYPE html>
-                <html>
-                <head>
-                    <meta charset="utf-8">
-                    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                    <title>{subject}</title>
-                    <style>
-                        body {{
-                            font-family: Arial, sans-serif;
-                            line-height: 1.6;
-                            color: #333;
-                            max-width: 600px;
-                            margin: 0 auto;
-                            padding: 20px;
-                        }}
-                        .header {{
-                            background: linear-gradient(135deg, #FF9800 0%, #F57C00 100%);
-                            color: white;
-                            padding: 30px;
-                            text-align: center;
-                            border-radius: 10px 10px 0 0;
-                        }}
-                        .content {{
-                            background: #f9f9f9;
-                            padding: 30px;
-                            border-radius: 0 0 10px 10px;
-                        }}
-                    </style>
-                </head>
-                <body>
-                    <div class="header">
-                        <h1>{subject}</h1>
-                    </div>
-                    <div class="content">
-                        {message}
-                        
-                        <p>Best regards,<br>
-                        <strong>{settings.FROM_NAME}</strong></p>
-                    </div>
-                </body>
-                </html>
-                """
-                
-                if send_email_brevo(email, subject, text_content, html_content):
-                    results["success"].append(email)
-                    logger.info(f"Bulk email sent successfully to {email}")
-                else:
-                    results["failed"].append({"email": email, "error": "Failed to send email"})
-                
-            except Exception as e:
-                results["failed"].append({"email": email, "error": str(e)})
-                logger.error(f"Failed to send bulk email to {email}: {e}")
+        # Same body for every recipient, so render it once and send it in
+        # messageVersions batches instead of one request per recipient
+        text_content, html_content = _render_email("bulk", subject=subject, message=message)
+        
+        semaphore = asyncio.Semaphore(BULK_EMAIL_CONCURRENCY)
+        
+        async def _send_batch(batch):
+            async with semaphore:
+                return batch, await send_batch_email_brevo(batch, subject, text_content, html_content)
+        
+        sent_batches = await asyncio.gather(*(
+            _send_batch(emails[start:start + BREVO_MAX_MESSAGE_VERSIONS])
+            for start in range(0, len(emails), BREVO_MAX_MESSAGE_VERSIONS)
+        ))
+        for batch, sent in sent_batches:
+            if sent:
+                results["success"].extend(batch)
+            else:
+                results["failed"].extend({"email": email, "error": "Failed to send email"} for email in batch)
         
         return results
@@ -0,0 +1,134 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from config import settings
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional; fall back to a per-process store
+    redis = aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Shared Redis connection pool when REDIS_URL is configured, otherwise None
+redis_client = (
+    redis.Redis.from_url(settings.REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+    if redis is not None and settings.REDIS_URL
+    else None
+)
+
+# Same server through redis.asyncio, for coroutines that must not block the event loop
+async_redis_client = (
+    aioredis.Redis.from_url(settings.REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+    if aioredis is not None and settings.REDIS_URL
+    else None
+)
+
+# Process-local fallback: key -> (expires_at, serialized value), least recently used
+# first. Bounded to LOCAL_CACHE_MAX_ENTRIES so one-off keys can't grow it forever
+_local_cache = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def shared_cache_available() -> bool:
+    """Whether cached values are visible to every worker process (i.e. Redis is configured)"""
+    return redis_client is not None
+
+
+def _evict_local() -> None:
+    """Drop expired entries, then the least recently used ones, until the store fits. Caller holds _local_lock"""
+    if len(_local_cache) <= settings.LOCAL_CACHE_MAX_ENTRIES:
+        return
+    now = time.monotonic()
+    for key in [k for k, (expires_at, _) in _local_cache.items() if expires_at < now]:
+        del _local_cache[key]
+    while len(_local_cache) > settings.LOCAL_CACHE_MAX_ENTRIES:
+        _local_cache.popitem(last=False)
+
+
+def cache_get(key: str) -> Optional[Any]:
+    """Return the cached JSON value for key, or None on a miss or cache error"""
+    if redis_client is not None:
+        try:
+            raw = redis_client.get(key)
+        except redis.RedisError as e:
+            logger.warning(f"Cache get failed for {key}: {e}")
+            return None
+    else:
+        with _local_lock:
+            entry = _local_cache.get(key)
+            if entry and entry[0] < time.monotonic():
+                del _local_cache[key]
+                entry = None
+            elif entry:
+                _local_cache.move_to_end(key)
+        raw = entry[1] if entry else None
+
+    return json.loads(raw) if raw is not None else None
+
+
+def cache_set(key: str, value: Any, ttl: int) -> None:
+    """Store value as JSON under key for ttl seconds"""
+    raw = json.dumps(value, default=str)
+    if redis_client is not None:
+        try:
+            redis_client.set(key, raw, ex=ttl)
+        except redis.RedisError as e:
+            logger.warning(f"Cache set failed for {key}: {e}")
+        return
+
+    with _local_lock:
+        _local_cache[key] = (time.monotonic() + ttl, raw)
+        _local_cache.move_to_end(key)
+        _evict_local()
+
+
+def cache_delete_prefix(prefix: str) -> None:
+    """Drop every cached key starting with prefix"""
+    if redis_client is not None:
+        try:
+            keys = list(redis_client.scan_iter(match=f"{prefix}*", count=500))
+            if keys:
+                redis_client.delete(*keys)
+        except redis.RedisError as e:
+            logger.warning(f"Cache delete failed for {prefix}*: {e}")
+        return
+
+    with _local_lock:
+        for key in [k for k in _local_cache if k.startswith(prefix)]:
+            del _local_cache[key]
+
+
+async def cache_get_async(key: str) -> Optional[Any]:
+    """cache_get for coroutines: awaits Redis instead of blocking the event loop"""
+    if async_redis_client is None:
+        # The process-local store never blocks
+        return cache_get(key)
+    try:
+        raw = await async_redis_client.get(key)
+    except redis.RedisError as e:
+        logger.warning(f"Cache get failed for {key}: {e}")
+        return None
+    return json.loads(raw) if raw is not None else None
+
+
+async def cache_set_async(key: str, value: Any, ttl: int) -> None:
+    """cache_set for coroutines: awaits Redis instead of blocking the event loop"""
+    if async_redis_client is None:
+        cache_set(key, value, ttl)
+        return
+    try:
+        await async_redis_client.set(key, json.dumps(value, default=str), ex=ttl)
+    except redis.RedisError as e:
+        logger.warning(f"Cache set failed for {key}: {e}")
+
+
+async def close_async_cache() -> None:
+    """Close the async Redis connection pool on shutdown"""
+    if async_redis_client is not None:
+        await async_redis_client.aclose()
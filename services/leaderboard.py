@@ -1,77 +1,101 @@
-from .users import get_user_data
-from .aws_resources import reading_history_table, reading_statistics_table
+from .users import get_users_data
+from .aws_resources import get_table, batch_get_items
+from .cache import cache_get, cache_set
+from .admins_service import is_valid_uuid
 from sqlalchemy.orm import Session
+from sqlalchemy import func, distinct
 from database.models import ReadingHistory, User, School
 from database.connection import get_db
-import uuid
+import heapq
+from collections import defaultdict
+
+SCHOOL_LEADERBOARD_TTL = 60  # seconds a school leaderboard page is served from cache
+
+def _scan_items(table, **kwargs):
+    """Yield every item of a DynamoDB scan page by page, following LastEvaluatedKey past the 1MB limit"""
+    response = table.scan(**kwargs)
+    yield from response.get('Items', [])
+    while 'LastEvaluatedKey' in response:
+        response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'], **kwargs)
+        yield from response.get('Items', [])
+
+def _with_int(item, field):
+    """Coerce item[field] to int in place (0 when missing or malformed) and return the item"""
+    try:
+        item[field] = int(item.get(field, 0))
+    except (ValueError, TypeError):
+        item[field] = 0
+    return item
+
+def _top_statistics(field, count):
+    """Top `count` reading_statistics items by an integer field, with all their attributes"""
+    # The scan only returns the key and the ranked field; nlargest keeps just `count`
+    # items while the pages stream past
+    top = heapq.nlargest(
+        count,
+        (_with_int(item, field) for item in _scan_items(
+            get_table('reading_statistics'),
+            ProjectionExpression='#user_ic, #field',
+            ExpressionAttributeNames={'#user_ic': 'user_ic', '#field': field}
+        )),
+        key=lambda x: x.get(field, 0)
+    )
+    # Then the full items for just those users
+    stats = {item['user_ic']: item for item in batch_get_items(
+        get_table('reading_statistics'), 'user_ic', (entry.get('user_ic', '') for entry in top)
+    )}
+    return [{**stats.get(entry.get('user_ic', ''), {}), **entry} for entry in top]
 
 def get_top_readers(count=3):
-    response = reading_statistics_table.scan()
-    items = response.get('Items', [])
-    for item in items:
-        try:
-            item['total_read_books'] = int(str(item.get('total_read_books', '0')))
-        except (ValueError, TypeError):
-            item['total_read_books'] = 0
-    top_readers = sorted(
-        items,
-        key=lambda x: x.get('total_read_books', 0),
-        reverse=True
-    )[:count]
+    top_readers = _top_statistics('total_read_books', count)
+    # One BatchGetItem for the whole top-N instead of a GetItem per entry
+    users = get_users_data(reader.get('user_ic', '') for reader in top_readers)
     for reader in top_readers:
-        user_ic = reader.get('user_ic', '')
-        if user_ic:
-            reader.update(get_user_data(user_ic))
+        reader.update(users.get(reader.get('user_ic', ''), {}))
     return top_readers
 
 def get_top_reading_time(count=3):
-    response = reading_statistics_table.scan()
-    items = response.get('Items', [])
-    for item in items:
-        try:
-            item['total_read_period'] = int(str(item.get('total_read_period', '0')))
-        except (ValueError, TypeError):
-            item['total_read_period'] = 0
-    top_reading_time = sorted(
-        items,
-        key=lambda x: x.get('total_read_period', 0),
-        reverse=True
-    )[:count]
+    top_reading_time = _top_statistics('total_read_period', count)
+    # One BatchGetItem for the whole top-N instead of a GetItem per entry
+    users = get_users_data(reader.get('user_ic', '') for reader in top_reading_time)
     for reader in top_reading_time:
-        user_ic = reader.get('user_ic', '')
-        if user_ic:
-            reader.update(get_user_data(user_ic))
+        reader.update(users.get(reader.get('user_ic', ''), {}))
     return top_reading_time
 
 def get_top_quiz_scores(count=3):
-    response = reading_history_table.scan()
-    history_items = response.get('Items', [])
-    user_scores = {}
+    # Only the two attributes summed here are read from each history item
+    history_items = _scan_items(
+        get_table('reading_history'),
+        ProjectionExpression='#user_ic, #score',
+        ExpressionAttributeNames={'#user_ic': 'user_ic', '#score': 'score'}
+    )
+    # Sum raw scores per user, then build the entry dicts once per user
+    totals = defaultdict(float)
     for item in history_items:
         user_ic = item.get('user_ic', '')
+        if not user_ic:
+            continue
         try:
-            score = float(str(item.get('score', '0')))
+            score = float(item.get('score', 0))
         except (ValueError, TypeError):
-            score = 0
-        if user_ic:
-            user_scores.setdefault(user_ic, {'user_ic': user_ic, 'score': 0})['score'] += score
-    top_quiz_scores = sorted(
-        user_scores.values(),
-        key=lambda x: x.get('score', 0),
-        reverse=True
-    )[:count]
+            score = 0.0
+        totals[user_ic] += score
+    user_scores = [{'user_ic': user_ic, 'score': score} for user_ic, score in totals.items()]
+    top_quiz_scores = heapq.nlargest(
+        count,
+        user_scores,
+        key=lambda x: x.get('score', 0)
+    )
+    # One BatchGetItem for the whole top-N instead of a GetItem per entry
+    users = get_users_data(scorer.get('user_ic', '') for scorer in top_quiz_scores)
     for scorer in top_quiz_scores:
-        user_ic = scorer.get('user_ic', '')
-        if user_ic:
-            scorer.update(get_user_data(user_ic))
+        scorer.update(users.get(scorer.get('user_ic', ''), {}))
     return top_quiz_scores
 
 def get_school_leaderboard(school_id: str, db: Session, page: int = 1, limit: int = 20):
     """Get leaderboard for a specific school by grouping scores by user_id"""
     try:
-        try:
-            uuid.UUID(school_id)
-        except ValueError:
+        if not is_valid_uuid(school_id):
             return {
                 "success": False,
                 "data": None,
@@ -96,10 +120,15 @@ def get_school_leaderboard(school_id: str, db: Session, page: int = 1, limit: in
                 "error": "INVALID_LIMIT"
             }
         
-        # Get all users from the school
+        # Leaderboards move slowly, so a page may be up to SCHOOL_LEADERBOARD_TTL old
+        cache_key = f"lb:school:{school_id}:{page}:{limit}"
+        cached = cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Make sure the school has users before aggregating
         try:
-            users = db.query(User).filter(User.school_id == school_id).all()
-            user_ids = [str(user.id) for user in users]
+            has_users = db.query(User.id).filter(User.school_id == school_id).first() is not None
         except Exception as e:
             return {
                 "success": False,
@@ -108,7 +137,7 @@ def get_school_leaderboard(school_id: str, db: Session, page: int = 1, limit: in
                 "error": "DATABASE_ERROR"
             }
         
-        if not user_ids:
+        if not has_users:
             return {
                 "success": False,
                 "data": None,
@@ -116,19 +145,44 @@ def get_school_leaderboard(school_id: str, db: Session, page: int = 1, limit: in
                 "error": "NO_USERS_FOUND"
             }
         
-        # Get all reading history for users in this school
+        # Sum scores per user in the database and fetch only the requested page
+        start_idx = (page - 1) * limit
+        total_score = func.coalesce(func.sum(ReadingHistory.score), 0.0)
         try:
-            reading_records = db.query(
-                ReadingHistory.user_id,
-                ReadingHistory.score,
+            paginated_leaderboard = db.query(
+                User.id.label('user_id'),
                 User.name,
                 User.ic_number,
-                User.avatar_url
+                User.avatar_url,
+                total_score.label('total_score'),
+                # Counting user_id (never NULL after the join) keeps the scan on the
+                # covering ix_reading_history_user_started index, which INCLUDEs score
+                func.count(ReadingHistory.user_id).label('reading_sessions'),
+                # Number of ranked users, computed before OFFSET/LIMIT so it rides along with the page
+                func.count().over().label('total_count')
             ).join(
-                User, ReadingHistory.user_id == User.id
+                ReadingHistory, ReadingHistory.user_id == User.id
             ).filter(
-                ReadingHistory.user_id.in_(user_ids)
+                User.school_id == school_id
+            ).group_by(
+                User.id
+            ).order_by(
+                total_score.desc(), User.id
+            ).offset(
+                start_idx
+            ).limit(
+                limit
             ).all()
+            
+            total_count = paginated_leaderboard[0].total_count if paginated_leaderboard else 0
+            
+            # A page past the end has no rows to carry the total
+            if not paginated_leaderboard and page > 1:
+                total_count = db.query(func.count(distinct(ReadingHistory.user_id))).join(
+                    User, ReadingHistory.user_id == User.id
+                ).filter(
+                    User.school_id == school_id
+                ).scalar()
         except Exception as e:
             return {
                 "success": False,
@@ -137,56 +191,20 @@ def get_school_leaderboard(school_id: str, db: Session, page: int = 1, limit: in
                 "error": "DATABASE_ERROR"
             }
         
-        # Group and calculate scores manually
-        user_scores = {}
-        for record in reading_records:
-            user_id = str(record.user_id)
-            if user_id not in user_scores:
-                user_scores[user_id] = {
-                    "user_id": user_id,
-                    "name": record.name,
-                    "ic_number": record.ic_number,
-                    "avatar_url": record.avatar_url,
-                    "total_score": 0.0,
-                    "reading_sessions": 0
-                }
-            
-            # Convert score string to float safely
-            try:
-                score = float(record.score) if record.score else 0.0
-            except (ValueError, TypeError):
-                score = 0.0
-            
-            user_scores[user_id]["total_score"] += score
-            user_scores[user_id]["reading_sessions"] += 1
-        
-        # Sort by total score in descending order
-        leaderboard_list = sorted(
-            user_scores.values(),
-            key=lambda x: x["total_score"],
-            reverse=True
-        )
-        
-        # Apply pagination
-        total_count = len(leaderboard_list)
-        start_idx = (page - 1) * limit
-        end_idx = start_idx + limit
-        paginated_leaderboard = leaderboard_list[start_idx:end_idx]
-        
         # Add ranking
         leaderboard = []
         for rank, entry in enumerate(paginated_leaderboard, start=start_idx + 1):
             leaderboard.append({
                 "rank": rank,
-                "user_id": entry["user_id"],
-                "name": entry["name"],
-                "ic_number": entry["ic_number"],
-                "avatar_url": entry["avatar_url"],
-                "total_score": entry["total_score"],
-                "reading_sessions": entry["reading_sessions"]
+                "user_id": str(entry.user_id),
+                "name": entry.name,
+                "ic_number": entry.ic_number,
+                "avatar_url": entry.avatar_url,
+                "total_score": entry.total_score,
+                "reading_sessions": entry.reading_sessions
             })
         
-        return {
+        result = {
             "success": True,
             "data": {
                 "leaderboard": leaderboard,
@@ -198,6 +216,8 @@ def get_school_leaderboard(school_id: str, db: Session, page: int = 1, limit: in
             "message": f"Leaderboard fetched successfully for school_id: {school_id}",
             "error": None
         }
+        cache_set(cache_key, result, SCHOOL_LEADERBOARD_TTL)
+        return result
         
     except Exception as e:
         return {
@@ -0,0 +1,27 @@
+import asyncio
+import logging
+
+from fastapi.concurrency import run_in_threadpool
+
+from database.connection import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def _run_job(job):
+    """Run a synchronous job with its own short-lived session"""
+    db = SessionLocal()
+    try:
+        job(db)
+    finally:
+        db.close()
+
+
+async def run_periodically(job, interval: int):
+    """Call job(db) every interval seconds off the event loop until cancelled"""
+    while True:
+        try:
+            await run_in_threadpool(_run_job, job)
+        except Exception as e:
+            logger.error(f"Periodic job {job.__name__} failed: {e}")
+        await asyncio.sleep(interval)
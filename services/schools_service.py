@@ -1,10 +1,74 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, distinct, desc, asc
-from database.models import School, User, ReadingHistory
+from sqlalchemy import func, distinct, desc, asc, case, lambda_stmt, select
+from database.models import School, User, Admin
+from database.views import monthly_active_students
+from services.cache import cache_get, cache_set, cache_delete_prefix
+import hashlib
 import uuid
 from datetime import datetime, timedelta
 from typing import List, Optional
-import json
+import orjson
+
+# Dashboards poll the school analytics; results are cached briefly and dropped on every school write
+SCHOOL_ANALYTICS_CACHE_PREFIX = "schools:analytics:"
+SCHOOL_ANALYTICS_TTL = 60  # seconds
+
+# Analytics sort ids that order by a student count; only these need every school's counts
+SCHOOL_ANALYTICS_AGGREGATE_SORTS = {
+    "total_students",
+    "count_of_registered_students",
+    "percent_of_registered_students",
+    "count_of_active_students",
+    "percent_of_active_students",
+}
+
+# Rows per server-side cursor fetch when exporting the analytics of every school
+SCHOOL_ANALYTICS_EXPORT_BATCH_SIZE = 500
+
+# Sort ids accepted by get_all_schools -> column ordered on
+SCHOOL_SORT_COLUMNS = {
+    "name": School.name,
+    "state": School.state,
+    "city": School.city,
+    "status": School.status,
+    "created_at": School.created_at,
+    "students_count": func.count(User.id),
+}
+
+# Ids per DELETE when removing schools in bulk, keeping the IN lists bounded
+BULK_DELETE_CHUNK_SIZE = 1000
+
+
+def invalidate_school_analytics():
+    """Drop the cached school analytics after the schools table changes"""
+    cache_delete_prefix(SCHOOL_ANALYTICS_CACHE_PREFIX)
+
+
+def _school_analytics_cache_key(kind: str, **params):
+    """Cache key for one analytics request; the month is part of it since active students are per month"""
+    params["month"] = datetime.now().strftime("%Y-%m")
+    digest = hashlib.sha1(orjson.dumps(params, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    return f"{SCHOOL_ANALYTICS_CACHE_PREFIX}{kind}:{digest}"
+
+
+def _school_analytics_row(school, total_students, completed_count, active_students_count):
+    """Analytics dict for one school from its student counts"""
+    completed_percentage = (completed_count / total_students * 100) if total_students > 0 else 0
+    active_percentage = (active_students_count / total_students * 100) if total_students > 0 else 0
+    return {
+        "school_name": school.name,
+        "id": str(school.id),
+        "state": school.state,
+        "city": school.city,
+        "status": school.status,
+        "created_at": school.created_at.isoformat() if school.created_at else None,
+        "updated_at": school.updated_at.isoformat() if school.updated_at else None,
+        "total_students": total_students,
+        "count_of_registered_students": completed_count,
+        "percent_of_registered_students": round(completed_percentage, 2),
+        "count_of_active_students": active_students_count,
+        "percent_of_active_students": round(active_percentage, 2)
+    }
 
 
 def get_all_schools(db: Session, page: int = 1, limit: int = 20, sort: Optional[str] = None, name: Optional[str] = None, state: Optional[str] = None, city: Optional[str] = None):
@@ -31,44 +95,14 @@ def get_all_schools(db: Session, page: int = 1, limit: int = 20, sort: Optional[
         # Apply sorting
         if sort:
             try:
-                sort_params = json.loads(sort)
+                sort_params = orjson.loads(sort)
                 if isinstance(sort_params, list):
                     for sort_item in sort_params:
                         if isinstance(sort_item, dict):
-                            field = sort_item.get('id')
-                            desc_order = sort_item.get('desc', False)
-                            
-                            if field == 'name':
-                                if desc_order:
-                                    query = query.order_by(desc(School.name))
-                                else:
-                                    query = query.order_by(asc(School.name))
-                            elif field == 'state':
-                                if desc_order:
-                                    query = query.order_by(desc(School.state))
-                                else:
-                                    query = query.order_by(asc(School.state))
-                            elif field == 'city':
-                                if desc_order:
-                                    query = query.order_by(desc(School.city))
-                                else:
-                                    query = query.order_by(asc(School.city))
-                            elif field == 'status':
-                                if desc_order:
-                                    query = query.order_by(desc(School.status))
-                                else:
-                                    query = query.order_by(asc(School.status))
-                            elif field == 'created_at':
-                                if desc_order:
-                                    query = query.order_by(desc(School.created_at))
-                                else:
-                                    query = query.order_by(asc(School.created_at))
-                            elif field == 'students_count':
-                                if desc_order:
-                                    query = query.order_by(desc(func.count(User.id)))
-                                else:
-                                    query = query.order_by(asc(func.count(User.id)))
-            except (json.JSONDecodeError, KeyError, TypeError):
+                            column = SCHOOL_SORT_COLUMNS.get(sort_item.get('id'))
+                            if column is not None:
+                                query = query.order_by(desc(column) if sort_item.get('desc', False) else asc(column))
+            except (orjson.JSONDecodeError, KeyError, TypeError):
                 # If sorting fails, use default sorting by name
                 query = query.order_by(asc(School.name))
         else:
@@ -108,17 +142,18 @@ def get_all_schools(db: Session, page: int = 1, limit: int = 20, sort: Optional[
 def get_school_by_id(school_id: str, db: Session):
     """Get a single school by ID with students data"""
     try:
-        print('school_id', school_id)
-        school = db.query(School).filter(School.id == school_id).first()
+        school = db.get(School, school_id)
         if not school:
             return None
         
-        # Get students for this school
-        students = db.query(User).filter(User.school_id == school_id).all()
+        # Count students in the database instead of loading every row
+        students_count = db.execute(
+            lambda_stmt(lambda: select(func.count(User.id)).where(User.school_id == school_id))
+        ).scalar()
         
         return {
             "school": school,
-            "students_count": len(students)
+            "students_count": students_count
         }
     except Exception as e:
         db.rollback()
@@ -139,6 +174,7 @@ def add_school(school_data: dict, db: Session):
         )
         db.add(new_school)
         db.commit()
+        invalidate_school_analytics()
         db.refresh(new_school)
         return new_school
     except Exception as e:
@@ -149,7 +185,7 @@ def add_school(school_data: dict, db: Session):
 def update_school(school_id: str, school_data: dict, db: Session):
     """Update an existing school"""
     try:
-        school = db.query(School).filter(School.id == school_id).first()
+        school = db.get(School, school_id)
         if not school:
             return None
         
@@ -160,6 +196,7 @@ def update_school(school_id: str, school_data: dict, db: Session):
         
         school.updated_at = datetime.now()
         db.commit()
+        invalidate_school_analytics()
         db.refresh(school)
         return school
     except Exception as e:
@@ -170,11 +207,12 @@ def update_school(school_id: str, school_data: dict, db: Session):
 def delete_school(school_id: str, db: Session):
     """Delete a single school"""
     try:
-        school = db.query(School).filter(School.id == school_id).first()
+        school = db.get(School, school_id)
         if not school:
             return None
         db.delete(school)
         db.commit()
+        invalidate_school_analytics()
         return True
     except Exception as e:
         db.rollback()
@@ -184,143 +222,181 @@ def delete_school(school_id: str, db: Session):
 def delete_bulk_schools(school_ids: List[str], db: Session):
     """Delete multiple schools by their IDs"""
     try:
-        schools = db.query(School).filter(School.id.in_(school_ids)).all()
-        if not schools:
+        deleted = 0
+        # Set-based statements per chunk instead of loading and deleting each school
+        for start in range(0, len(school_ids), BULK_DELETE_CHUNK_SIZE):
+            chunk = school_ids[start:start + BULK_DELETE_CHUNK_SIZE]
+            # Detach admins first, as the ORM delete did through School.admins
+            db.query(Admin).filter(Admin.school_id.in_(chunk)).update(
+                {Admin.school_id: None}, synchronize_session=False
+            )
+            deleted += db.query(School).filter(School.id.in_(chunk)).delete(synchronize_session=False)
+        if not deleted:
+            db.rollback()
             return None
         
-        for school in schools:
-            db.delete(school)
-        
         db.commit()
-        return len(schools)
+        invalidate_school_analytics()
+        return deleted
     except Exception as e:
         db.rollback()
         return None
 
 
+def _filtered_schools_query(db: Session, name: Optional[str] = None, state: Optional[str] = None, city: Optional[str] = None):
+    """Schools matching the analytics name/state/city filters"""
+    query = db.query(School)
+    
+    if name:
+        query = query.filter(School.name.ilike(f"%{name}%"))
+    
+    if state:
+        query = query.filter(School.state.ilike(f"%{state}%"))
+    
+    if city:
+        query = query.filter(School.city.ilike(f"%{city}%"))
+    
+    return query
+
+
+def _analytics_sort_items(sort: Optional[str]):
+    """Parsed sort items ({"id", "desc"} dicts) from the sort JSON, or [] when it is missing or invalid"""
+    if not sort:
+        return []
+    try:
+        sort_params = orjson.loads(sort)
+    except orjson.JSONDecodeError:
+        # If sorting fails, keep original order
+        return []
+    if not isinstance(sort_params, list):
+        return []
+    return [item for item in sort_params if isinstance(item, dict)]
+
+
+def _order_by_sort_items(query, sort_items, columns):
+    """Apply the sort items whose id is in columns, then School.id so pages stay stable on ties"""
+    for sort_item in sort_items:
+        column = columns.get(sort_item.get("id"))
+        if column is not None:
+            query = query.order_by(desc(column) if sort_item.get("desc", False) else asc(column))
+    if sort_items:
+        query = query.order_by(School.id)
+    return query
+
+
+def _student_counts(db: Session, school_ids=None):
+    """Total, COMPLETED and active-this-month students per school, for school_ids or every school"""
+    # Calculate current month for active students calculation
+    current_date = datetime.now()
+    current_month_start = current_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    
+    # Active students: 3+ reading sessions this month, each over 20 seconds
+    # (precomputed per month in the monthly_active_students view)
+    active_students_subquery = db.query(monthly_active_students.c.user_id).filter(
+        monthly_active_students.c.month == current_month_start.date()
+    ).subquery()
+    
+    query = db.query(
+        User.school_id,
+        func.count(User.id).label('total_students'),
+        func.count(User.id).filter(User.registration_status == "COMPLETED").label('completed_count'),
+        func.count(active_students_subquery.c.user_id).label('active_students_count')
+    ).outerjoin(
+        active_students_subquery, active_students_subquery.c.user_id == User.id
+    )
+    if school_ids is not None:
+        query = query.filter(User.school_id.in_(school_ids))
+    return query.group_by(User.school_id)
+
+
+def _with_school_analytics(db: Session, query, sort_items):
+    """Join every school's student counts onto a schools query, ordered by the sort items"""
+    # Counts for all schools, so the analytics columns can be sorted on before the page is cut
+    student_counts = _student_counts(db).subquery()
+    
+    total_students = func.coalesce(student_counts.c.total_students, 0)
+    completed_count = func.coalesce(student_counts.c.completed_count, 0)
+    active_students_count = func.coalesce(student_counts.c.active_students_count, 0)
+    
+    def _percent_of_students(count):
+        return case((total_students > 0, count * 100.0 / total_students), else_=0)
+    
+    sortable_fields = {
+        "school_name": School.name,
+        "total_students": total_students,
+        "count_of_registered_students": completed_count,
+        "percent_of_registered_students": _percent_of_students(completed_count),
+        "count_of_active_students": active_students_count,
+        "percent_of_active_students": _percent_of_students(active_students_count),
+    }
+    
+    query = query.outerjoin(
+        student_counts, student_counts.c.school_id == School.id
+    ).add_columns(
+        total_students.label('total_students'),
+        completed_count.label('completed_count'),
+        active_students_count.label('active_students_count')
+    )
+    
+    return _order_by_sort_items(query, sort_items, sortable_fields)
+
+
 def get_schools_analytics(db: Session, page: int = 1, perPage: int = 20, name: Optional[str] = None, state: Optional[str] = None, city: Optional[str] = None, sort: Optional[str] = None):
     """Get schools analytics with enhanced data including active students calculation"""
+    cache_key = _school_analytics_cache_key(
+        "list", page=page, perPage=perPage, name=name, state=state, city=city, sort=sort
+    )
+    cached = cache_get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        # Start with base query for schools
-        query = db.query(School)
-        
-        # Apply filters
-        if name:
-            query = query.filter(School.name.ilike(f"%{name}%"))
-        
-        if state:
-            query = query.filter(School.state.ilike(f"%{state}%"))
-        
-        if city:
-            query = query.filter(School.city.ilike(f"%{city}%"))
+        query = _filtered_schools_query(db, name, state, city)
         
         # Get total count for pagination
         total_count = query.count()
         
-        # Apply pagination
-        schools = query.offset((page - 1) * perPage).limit(perPage).all()
-        
-        # Calculate current month for active students calculation
-        current_date = datetime.now()
-        current_month_start = current_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        schools_data = []
-        for school in schools:
-            # Get total students for this school
-            total_students = db.query(User).filter(User.school_id == school.id).count()
-            
-            # Get students count by registration status for this school
-            students_by_status = db.query(
-                User.registration_status,
-                func.count(User.id).label('count')
-            ).filter(
-                User.school_id == school.id
-            ).group_by(
-                User.registration_status
-            ).all()
-            
-            # Calculate completed students count and percentage
-            completed_count = 0
-            for status, count in students_by_status:
-                if status == "COMPLETED":
-                    completed_count = count
-                    break
-            
-            completed_percentage = (completed_count / total_students * 100) if total_students > 0 else 0
-            
-            # Calculate active students (students with 3+ reading sessions this month, each over 20 seconds)
-            active_students_subquery = db.query(ReadingHistory.user_id).filter(
-                ReadingHistory.started_at >= current_month_start,
-                ReadingHistory.duration > 20
-            ).group_by(
-                ReadingHistory.user_id
-            ).having(
-                func.count(ReadingHistory.id) >= 3
-            ).subquery()
-            
-            active_students_count = db.query(func.count(User.id)).filter(
-                User.school_id == school.id,
-                User.id.in_(active_students_subquery)
-            ).scalar()
-            active_percentage = (active_students_count / total_students * 100) if total_students > 0 else 0
-            
-            # Create school data object
-            school_data = {
-                "school_name": school.name,
-                "id": str(school.id),
-                "state": school.state,
-                "city": school.city,
-                "status": school.status,
-                "created_at": school.created_at.isoformat() if school.created_at else None,
-                "updated_at": school.updated_at.isoformat() if school.updated_at else None,
-                "total_students": total_students,
-                "count_of_registered_students": completed_count,
-                "percent_of_registered_students": round(completed_percentage, 2),
-                "count_of_active_students": active_students_count,
-                "percent_of_active_students": round(active_percentage, 2)
+        sort_items = _analytics_sort_items(sort)
+        if any(item.get("id") in SCHOOL_ANALYTICS_AGGREGATE_SORTS for item in sort_items):
+            # Sorting on a count: rank every matching school in SQL, then paginate
+            query = _with_school_analytics(db, query, sort_items)
+            rows = query.offset((page - 1) * perPage).limit(perPage).all()
+        else:
+            # Only school columns are sorted on, so cut the page first and count
+            # students for the schools on it
+            query = _order_by_sort_items(query, sort_items, {"school_name": School.name})
+            schools = query.offset((page - 1) * perPage).limit(perPage).all()
+            counts = {
+                school_id: counts
+                for school_id, *counts in _student_counts(db, [school.id for school in schools])
             }
-            
-            schools_data.append(school_data)
+            rows = [(school, *counts.get(school.id, (0, 0, 0))) for school in schools]
         
-        # Apply sorting for analytics fields after data processing
-        if sort:
-            try:
-                sort_params = json.loads(sort)
-                if isinstance(sort_params, list):
-                    for sort_item in sort_params:
-                        if isinstance(sort_item, dict):
-                            field = sort_item.get("id")
-                            desc_order = sort_item.get("desc", False)
-                            
-                            # Handle analytics field sorting
-                            if field == "school_name":
-                                schools_data.sort(key=lambda x: x["school_name"], reverse=desc_order)
-                            elif field == "total_students":
-                                schools_data.sort(key=lambda x: x["total_students"], reverse=desc_order)
-                            elif field == "count_of_registered_students":
-                                schools_data.sort(key=lambda x: x["count_of_registered_students"], reverse=desc_order)
-                            elif field == "percent_of_registered_students":
-                                schools_data.sort(key=lambda x: x["percent_of_registered_students"], reverse=desc_order)
-                            elif field == "count_of_active_students":
-                                schools_data.sort(key=lambda x: x["count_of_active_students"], reverse=desc_order)
-                            elif field == "percent_of_active_students":
-                                schools_data.sort(key=lambda x: x["percent_of_active_students"], reverse=desc_order)
-            except:
-                # If sorting fails, keep original order
-                pass
+        schools_data = [_school_analytics_row(*row) for row in rows]
         
-        return {
+        result = {
             "data": schools_data,
             "total_count": total_count,
             "page": page,
             "perPage": perPage
         }
+        cache_set(cache_key, result, SCHOOL_ANALYTICS_TTL)
+        return result
         
     except Exception as e:
         db.rollback()
         return None
 
 
+def iter_schools_analytics(db: Session, name: Optional[str] = None, state: Optional[str] = None, city: Optional[str] = None, sort: Optional[str] = None):
+    """Yield the analytics of every matching school, fetched from a server-side cursor in batches"""
+    # Every school is exported, so counting all students in one grouped subquery is the cheap path
+    query = _with_school_analytics(db, _filtered_schools_query(db, name, state, city), _analytics_sort_items(sort))
+    # The identity map only holds unmodified schools weakly, so each batch is freed once yielded
+    for row in query.yield_per(SCHOOL_ANALYTICS_EXPORT_BATCH_SIZE):
+        yield _school_analytics_row(*row)
+
+
 def get_school_by_name(school_name: str, db: Session):
     """Get school by name"""
     try:
@@ -351,76 +427,50 @@ def get_schools_by_status(status: str, db: Session, page: int = 1, limit: int =
 
 def get_school_analytics_by_id(school_id: str, db: Session):
     """Get analytics for a single school by ID with enhanced data including active students calculation"""
+    cache_key = _school_analytics_cache_key("school", school_id=str(school_id))
+    cached = cache_get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
         # Get the school
-        school = db.query(School).filter(School.id == school_id).first()
+        school = db.get(School, school_id)
         if not school:
             return None
 
-        # Get total students for this school
-        total_students = db.query(User).filter(User.school_id == school_id).count()
-        
         # Get students count by registration status for this school
-        students_by_status = db.query(
-            User.registration_status,
-            func.count(User.id).label('count')
-        ).filter(
-            User.school_id == school_id
-        ).group_by(
-            User.registration_status
-        ).all()
+        students_by_status = db.execute(lambda_stmt(
+            lambda: select(User.registration_status, func.count(User.id).label('count'))
+            .where(User.school_id == school_id)
+            .group_by(User.registration_status)
+        )).all()
         
-        # Calculate completed students count and percentage
-        completed_count = 0
-        for status, count in students_by_status:
-            if status == "COMPLETED":
-                completed_count = count
-                break
+        # The per-status counts already cover every student of the school
+        total_students = sum(count for _, count in students_by_status)
         
-        completed_percentage = (completed_count / total_students * 100) if total_students > 0 else 0
+        # Convert students_by_status to dictionary format
+        status_analytics = dict(students_by_status)
+        completed_count = status_analytics.get("COMPLETED", 0)
         
         # Calculate current month for active students calculation
         current_date = datetime.now()
         current_month_start = current_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         
         # Calculate active students (students with 3+ reading sessions this month, each over 20 seconds)
-        active_students_subquery = db.query(ReadingHistory.user_id).filter(
-            ReadingHistory.started_at >= current_month_start,
-            ReadingHistory.duration > 20
-        ).group_by(
-            ReadingHistory.user_id
-        ).having(
-            func.count(ReadingHistory.id) >= 3
-        ).subquery()
-        
-        active_students_count = db.query(func.count(User.id)).filter(
-            User.school_id == school_id,
-            User.id.in_(active_students_subquery)
-        ).scalar()
-        active_percentage = (active_students_count / total_students * 100) if total_students > 0 else 0
-        
-        # Convert students_by_status to dictionary format
-        status_analytics = {}
-        for status, count in students_by_status:
-            status_analytics[status] = count
+        current_month = current_month_start.date()
+        active_students_count = db.execute(lambda_stmt(
+            lambda: select(func.count(User.id))
+            .join(monthly_active_students, monthly_active_students.c.user_id == User.id)
+            .where(User.school_id == school_id, monthly_active_students.c.month == current_month)
+        )).scalar()
 
-        # Create school data object matching the bulk analytics structure
+        # Same structure as the bulk analytics rows, plus the per-status breakdown
         school_data = {
-            "school_name": school.name,
-            "id": str(school.id),
-            "state": school.state,
-            "city": school.city,
-            "status": school.status,
-            "created_at": school.created_at.isoformat() if school.created_at else None,
-            "updated_at": school.updated_at.isoformat() if school.updated_at else None,
-            "total_students": total_students,
-            "count_of_registered_students": completed_count,
-            "percent_of_registered_students": round(completed_percentage, 2),
-            "count_of_active_students": active_students_count,
-            "percent_of_active_students": round(active_percentage, 2),
+            **_school_analytics_row(school, total_students, completed_count, active_students_count),
             "students_by_status": status_analytics
         }
 
+        cache_set(cache_key, school_data, SCHOOL_ANALYTICS_TTL)
         return school_data
     except Exception as e:
         db.rollback()
@@ -1,5 +1,9 @@
-from .aws_resources import ic_numbers_table
+from .aws_resources import get_table, batch_get_items
 
 def get_user_data(user_ic):
-    response = ic_numbers_table.get_item(Key={'icNumber': user_ic})
+    response = get_table('IC_Numbers').get_item(Key={'icNumber': user_ic})
     return response.get('Item', {})
+
+def get_users_data(user_ics):
+    """Fetch many users' items with BatchGetItem, keyed by IC number"""
+    return {item['icNumber']: item for item in batch_get_items(get_table('IC_Numbers'), 'icNumber', user_ics)}
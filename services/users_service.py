@@ -1,15 +1,25 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, distinct
+from sqlalchemy import func, distinct, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from database.models import User, School, ReadingHistory, Books, FavoriteBooks
+from services.aws_resources import get_cognito
+from config import settings
 import uuid
 from datetime import datetime
 from typing import List, Optional
 import logging
 import json
+import re
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# IC numbers are stored as 12-14 digits (see the bulk upload cleaner)
+_IC_NUMBER_RE = re.compile(r"\d{12,14}")
+
+# Statuses a user has before signing up; only these are promoted by the Cognito sync
+_PRE_SIGNUP_STATUSES = ("pending", "approved")
+
 def _is_json_field(field_name: str, value) -> bool:
     """Check if a field should be treated as JSON based on its value and name"""
     # Common JSON field names
@@ -606,4 +616,50 @@ def get_favorite_books(user_id: str, db: Session):
         
     except Exception as e:
         db.rollback()
-        return {"success": False, "data": "Error retrieving favorites"} 
\ No newline at end of file
+        return {"success": False, "data": "Error retrieving favorites"}
+
+
+def sync_cognito_users(db: Session):
+    """Add missing Cognito users to the users table and mark pre-signup rows as registered"""
+    try:
+        rows = []
+        skipped = 0
+        paginator = get_cognito().get_paginator('list_users')
+        for page in paginator.paginate(UserPoolId=settings.COGNITO_USER_POOL_ID, PaginationConfig={'PageSize': 60}):
+            for cognito_user in page['Users']:
+                # The Cognito username is the user's IC number; skip anything that isn't one
+                ic_number = cognito_user.get('Username')
+                if not ic_number or not _IC_NUMBER_RE.fullmatch(ic_number):
+                    skipped += 1
+                    continue
+                created_at = cognito_user.get('UserCreateDate')
+                rows.append({
+                    "ic_number": ic_number,
+                    "registration_status": "COMPLETED",
+                    "created_at": created_at.replace(tzinfo=None) if created_at else datetime.now()
+                })
+
+        if rows:
+            # Insert new users and complete existing ones in one statement. Only rows
+            # still waiting for sign-up are promoted: 'active', 'COMPLETED' and any
+            # admin-set status are left alone, since login only accepts 'active'
+            stmt = pg_insert(User).on_conflict_do_update(
+                index_elements=[User.ic_number],
+                set_={"registration_status": "COMPLETED", "updated_at": datetime.now()},
+                where=or_(
+                    User.registration_status.is_(None),
+                    # Equalities rather than IN: expanding parameters can't run as executemany
+                    *(func.lower(User.registration_status) == status for status in _PRE_SIGNUP_STATUSES)
+                )
+            )
+            db.execute(stmt, rows)
+            db.commit()
+
+        if skipped:
+            logger.warning("Skipped %s Cognito users whose username is not an IC number", skipped)
+        logger.info("Synced %s Cognito users", len(rows))
+        return len(rows)
+    except Exception as e:
+        logger.error(f"Error syncing Cognito users: {e}")
+        db.rollback()
+        return None